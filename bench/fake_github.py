@@ -0,0 +1,260 @@
+"""Servidor HTTP local que imita a API do GitHub usada pelo gym.py (Contents, Blobs e Git Data).
+
+Guarda os arquivos em memória e permite simular latência, conflitos (409/422) e o
+limite de requisições (cabeçalhos X-RateLimit-*, 403 quando esgota). Basta apontar
+GITHUB_API_URL para `FakeGitHub.url`:
+
+    servidor = FakeGitHub(latencia=0.05).start()
+    os.environ["GITHUB_API_URL"] = servidor.url
+"""
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+CONTENTS_MAX_BYTES = 1024 * 1024  # Acima disso a Contents API responde sem conteúdo (encoding "none")
+
+
+def git_blob_sha(data):
+    """SHA que o Git atribui ao blob (o mesmo que o GitHub devolve)"""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class FakeGitHub:
+    """Repositório em memória servido por HTTP, com um único branch"""
+
+    def __init__(self, latencia=0.0, taxa_conflito=0.0, limite=None, janela=3600, branch="main", seed=0):
+        self.latencia = latencia  # Segundos somados a cada resposta
+        self.taxa_conflito = taxa_conflito  # Probabilidade de um PUT/PATCH de ref ser recusado
+        self.limite = limite  # Requisições por janela (None = sem limite)
+        self.janela = janela
+        self.branch = branch
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.server = None
+        self.reset()
+
+    def reset(self, arquivos=None):
+        """Esvazia o repositório (ou carrega {caminho: bytes|str}) e zera as estatísticas"""
+        with self.lock:
+            self.arquivos = {}
+            self.blobs = {}
+            self.arvores = {}
+            self.commits = {"c0": {"arvore": "t0", "pai": None}}
+            self.head = "c0"
+            self.conflitos_pendentes = 0
+            self.restantes = self.limite
+            self.reinicio = time.time() + self.janela
+            self.estatisticas = Counter()
+        for caminho, conteudo in (arquivos or {}).items():
+            self.put_file(caminho, conteudo)
+        return self
+
+    def put_file(self, caminho, conteudo):
+        """Grava um arquivo direto no repositório, sem passar pela API"""
+        data = conteudo.encode("utf-8") if isinstance(conteudo, str) else conteudo
+        with self.lock:
+            self.arquivos[caminho] = data
+            self.blobs[git_blob_sha(data)] = data
+
+    def fail_next(self, vezes=1):
+        """Força conflito nas próximas `vezes` gravações"""
+        with self.lock:
+            self.conflitos_pendentes += vezes
+
+    def start(self):
+        handler = type("Handler", (_Handler,), {"fake": self})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    @property
+    def url(self):
+        host, porta = self.server.server_address
+        return f"http://{host}:{porta}"
+
+    def _conflito(self):
+        if self.conflitos_pendentes:
+            self.conflitos_pendentes -= 1
+            return True
+        return self.taxa_conflito > 0 and self.random.random() < self.taxa_conflito
+
+    def _rate_limit(self):
+        """Consome uma requisição; retorna (cabeçalhos, esgotou)"""
+        if self.limite is None:
+            return {}, False
+        agora = time.time()
+        if agora >= self.reinicio:
+            self.restantes, self.reinicio = self.limite, agora + self.janela
+        esgotou = self.restantes <= 0
+        if not esgotou:
+            self.restantes -= 1
+        cabecalhos = {
+            "X-RateLimit-Limit": str(self.limite),
+            "X-RateLimit-Remaining": str(self.restantes),
+            "X-RateLimit-Reset": str(int(self.reinicio))
+        }
+        return cabecalhos, esgotou
+
+    def handle(self, metodo, caminho, cabecalhos, corpo):
+        """Roteia uma requisição; retorna (status, corpo JSON ou None, cabeçalhos extras)"""
+        with self.lock:
+            limite, esgotou = self._rate_limit()
+            if esgotou:
+                return 403, {"message": "API rate limit exceeded"}, limite
+            m = re.match(r"^/repos/[^/]+/[^/]+/(contents|git)/(.*)$", caminho)
+            if not m:
+                return 404, {"message": "Not Found"}, limite
+            area, resto = m.groups()
+            if area == "contents":
+                status, resposta, extras = self._contents(metodo, resto, cabecalhos, corpo)
+            else:
+                status, resposta, extras = self._git(metodo, resto, corpo)
+            if status == 304 and self.limite is not None:
+                # Requisições condicionais respondidas com 304 não contam no limite do GitHub
+                self.restantes += 1
+                limite["X-RateLimit-Remaining"] = str(self.restantes)
+            return status, resposta, {**limite, **extras}
+
+    def _contents(self, metodo, caminho, cabecalhos, corpo):
+        data = self.arquivos.get(caminho)
+        if metodo == "GET":
+            if data is None:
+                return 404, {"message": "Not Found"}, {}
+            sha = git_blob_sha(data)
+            etag = f'"{sha}"'
+            if cabecalhos.get("If-None-Match") == etag:
+                return 304, None, {"ETag": etag}
+            resposta = {"path": caminho, "sha": sha, "size": len(data), "encoding": "base64",
+                        "content": base64.encodebytes(data).decode("ascii")}
+            if len(data) > CONTENTS_MAX_BYTES:
+                resposta.update(encoding="none", content="")
+            return 200, resposta, {"ETag": etag}
+
+        if metodo == "PUT":
+            atual = git_blob_sha(data) if data is not None else None
+            if corpo.get("sha") != atual or self._conflito():
+                # Sem sha para arquivo existente o GitHub responde 422; sha velho, 409
+                return (422 if "sha" not in corpo else 409), {"message": "sha mismatch"}, {}
+            novo = base64.b64decode(corpo["content"])
+            self.arquivos[caminho] = novo
+            self.blobs[git_blob_sha(novo)] = novo
+            self._novo_commit({caminho: novo})
+            return (200 if data is not None else 201), {"content": {"path": caminho, "sha": git_blob_sha(novo)},
+                                                        "commit": {"sha": self.head}}, {}
+        return 405, {"message": "Method Not Allowed"}, {}
+
+    def _novo_commit(self, alteracoes):
+        sha = f"c{len(self.commits)}"
+        self.commits[sha] = {"arvore": f"t-{sha}", "pai": self.head, "alteracoes": alteracoes}
+        self.head = sha
+        return sha
+
+    def _git(self, metodo, resto, corpo):
+        if metodo == "GET" and resto == f"ref/heads/{self.branch}":
+            return 200, {"object": {"sha": self.head, "type": "commit"}}, {}
+        if metodo == "GET" and resto.startswith("commits/"):
+            commit = self.commits.get(resto.split("/", 1)[1])
+            if commit is None:
+                return 404, {"message": "Not Found"}, {}
+            return 200, {"sha": resto.split("/", 1)[1], "tree": {"sha": commit["arvore"]}}, {}
+        if metodo == "GET" and resto.startswith("trees/"):
+            # Só a árvore do HEAD é listável: as outras guardam apenas as alterações
+            sha = resto.split("/", 1)[1]
+            if sha != self.commits[self.head]["arvore"]:
+                return 404, {"message": "Not Found"}, {}
+            itens = [{"path": caminho, "mode": "100644", "type": "blob", "sha": git_blob_sha(data), "size": len(data)}
+                     for caminho, data in sorted(self.arquivos.items())]
+            return 200, {"sha": sha, "tree": itens, "truncated": False}, {}
+        if metodo == "GET" and resto.startswith("blobs/"):
+            data = self.blobs.get(resto.split("/", 1)[1])
+            if data is None:
+                return 404, {"message": "Not Found"}, {}
+            return 200, {"sha": git_blob_sha(data), "size": len(data), "encoding": "base64",
+                         "content": base64.encodebytes(data).decode("ascii")}, {}
+        if metodo == "POST" and resto == "blobs":
+            data = base64.b64decode(corpo["content"]) if corpo.get("encoding") == "base64" else corpo["content"].encode("utf-8")
+            sha = git_blob_sha(data)
+            self.blobs[sha] = data
+            return 201, {"sha": sha}, {}
+        if metodo == "POST" and resto == "trees":
+            alteracoes = {}
+            for item in corpo["tree"]:
+                if "content" in item:
+                    alteracoes[item["path"]] = item["content"].encode("utf-8")
+                elif item.get("sha") is None:
+                    alteracoes[item["path"]] = None
+                else:
+                    alteracoes[item["path"]] = self.blobs[item["sha"]]
+            sha = f"t{len(self.arvores) + 1}"
+            self.arvores[sha] = alteracoes
+            return 201, {"sha": sha}, {}
+        if metodo == "POST" and resto == "commits":
+            sha = f"c{len(self.commits)}"
+            self.commits[sha] = {"arvore": corpo["tree"], "pai": corpo["parents"][0]}
+            return 201, {"sha": sha}, {}
+        if metodo == "PATCH" and resto == f"refs/heads/{self.branch}":
+            commit = self.commits.get(corpo["sha"])
+            if commit is None or commit["pai"] != self.head or self._conflito():
+                return 422, {"message": "Update is not a fast forward"}, {}
+            for caminho, data in self.arvores[commit["arvore"]].items():
+                if data is None:
+                    self.arquivos.pop(caminho, None)
+                else:
+                    self.arquivos[caminho] = data
+                    self.blobs[git_blob_sha(data)] = data
+            self.head = corpo["sha"]
+            return 200, {"object": {"sha": self.head}}, {}
+        return 404, {"message": "Not Found"}, {}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    fake = None
+    protocol_version = "HTTP/1.1"
+
+    def _responder(self):
+        inicio = time.perf_counter()
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        bruto = self.rfile.read(tamanho) if tamanho else b""
+        corpo = json.loads(bruto) if bruto else {}
+        caminho = unquote(urlsplit(self.path).path)
+        status, resposta, extras = self.fake.handle(self.command, caminho, self.headers, corpo)
+
+        if self.fake.latencia:
+            time.sleep(self.fake.latencia)
+        data = json.dumps(resposta).encode("utf-8") if resposta is not None else b""
+
+        # Contabiliza antes de responder, para o cliente nunca ver a resposta antes da estatística
+        with self.fake.lock:
+            e = self.fake.estatisticas
+            e["requisicoes"] += 1
+            e[f"{self.command} {status}"] += 1
+            e["bytes_recebidos"] += len(bruto)
+            e["bytes_enviados"] += len(data)
+            e["segundos_servidor"] += time.perf_counter() - inicio
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for nome, valor in extras.items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_PUT = do_POST = do_PATCH = do_DELETE = _responder
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,219 @@
+"""Benchmarks do gym.py contra o GitHub falso local, com saída JSON para acompanhar regressões.
+
+Para cada tamanho de histórico gera dados sintéticos, grava no servidor falso no formato
+configurado (GYM_STORAGE_FORMAT, GYM_STORAGE_MODE, GYM_STORAGE_BACKEND valem como no app)
+e mede carga, gravação, importação e a preparação de cada aba pelo AppTest do Streamlit.
+
+    python bench/run.py --linhas 1000 10000 100000 --latencia 0.02 --saida resultados.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import runpy
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from io import BytesIO
+
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_github import FakeGitHub  # noqa: E402
+from synthetic import GYM_PATH, generate_progresso, generate_treinos, load_plan  # noqa: E402
+
+ABAS = ["📅 Treino Diário", "📊 Progresso", "🏆 Metas", "⚙️ Configurações"]
+# Abas internas carregadas sob demanda: cada uma é medida à parte (chave do st.tabs, rótulos)
+SUBABAS = {"📊 Progresso": ("abas_progresso", ["📈 Métricas Diárias", "🏋️‍♂️ Evolução de Cargas", "📅 Calendário de Treinos"])}
+PROGRESSO_POR_TREINO = 6  # Um registro de progresso por dia contra ~6 exercícios por treino
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(GYM_PATH),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def clear_caches():
+    """Esquece tudo o que o app guarda entre execuções (cache de leitura, backend, figuras)"""
+    st.cache_resource.clear()
+    st.cache_data.clear()
+
+
+class Bench:
+    """Executa os cenários de um tamanho de histórico e acumula os resultados"""
+
+    def __init__(self, servidor, repeticoes, timeout):
+        self.servidor = servidor
+        self.repeticoes = repeticoes
+        self.timeout = timeout
+        self.resultados = []
+        self.app = None
+
+    def measure(self, cenario, linhas, medir, preparar=None):
+        """Mede `medir` `repeticoes` vezes (com `preparar` fora do tempo) e registra a mediana"""
+        tempos, stats = [], None
+        for _ in range(self.repeticoes):
+            if preparar:
+                preparar()
+            antes = dict(self.servidor.estatisticas)
+            inicio = time.perf_counter()
+            medir()
+            tempos.append(time.perf_counter() - inicio)
+            depois = self.servidor.estatisticas
+            stats = {k: depois.get(k, 0) - antes.get(k, 0)
+                     for k in ("requisicoes", "bytes_enviados", "bytes_recebidos")}
+        resultado = {"cenario": cenario, "linhas": linhas, "segundos": round(statistics.median(tempos), 4),
+                     "execucoes": [round(t, 4) for t in tempos], **stats}
+        self.resultados.append(resultado)
+        print(f"{linhas:>9} {cenario:<56} {resultado['segundos']:>9.3f}s {stats['requisicoes']:>5} req "
+              f"{stats['bytes_enviados'] / 1024:>10.1f} KiB ↓ {stats['bytes_recebidos'] / 1024:>10.1f} KiB ↑",
+              file=sys.stderr)
+        return resultado
+
+    def run_size(self, linhas, app):
+        plano = load_plan()
+        df_treinos = generate_treinos(linhas, plano=plano)
+        df_progresso = generate_progresso(max(1, linhas // PROGRESSO_POR_TREINO))
+        with open(os.path.join(os.path.dirname(GYM_PATH), "data", "metas.csv"), encoding="utf-8") as f:
+            metas = f.read()
+
+        # Grava os dados com as próprias funções do app, no formato e layout configurados
+        self.servidor.reset()
+        clear_caches()
+        df_metas = pd.read_csv(BytesIO(metas.encode("utf-8")))
+        app["save_many_to_github"]({"treinos": df_treinos, "progresso": df_progresso, "metas": df_metas,
+                                    "resumo": app["build_summary"](df_treinos)})
+
+        def frio():
+            clear_caches()
+            if os.path.exists(app["SQLITE_PATH"]):
+                for sufixo in ("", "-wal", "-shm"):
+                    if os.path.exists(app["SQLITE_PATH"] + sufixo):
+                        os.remove(app["SQLITE_PATH"] + sufixo)
+
+        self.measure("carregar_frio", linhas, lambda: app["load_data"]("treinos"), preparar=frio)
+        self.measure("carregar_quente", linhas, lambda: app["load_data"]("treinos"))
+
+        ttl = app["CACHE_TTL_SECONDS"]
+        app["CACHE_TTL_SECONDS"] = 0  # Força a revalidação por ETag (304)
+        self.measure("revalidar", linhas, lambda: app["load_data"]("treinos"))
+        app["CACHE_TTL_SECONDS"] = ttl
+
+        exercicio = df_treinos["Exercício"].iloc[0]
+        self.measure("carregar_projecao", linhas, lambda: app["load_data"](
+            "treinos", exercicio=exercicio, colunas=app["COLUNAS_CARGAS"]), preparar=frio)
+        self.measure("carregar_periodo_90d", linhas, lambda: app["load_data"](
+            "treinos", desde=datetime.now() - pd.Timedelta(days=90), colunas=app["COLUNAS_CALENDARIO"]), preparar=frio)
+
+        # Um dia do plano, como o botão "Salvar Treino"
+        dia = next(iter(plano))
+        treino_dia = pd.DataFrame([
+            {"Data": datetime.now().strftime("%Y-%m-%d"), "Dia": dia, "Grupo Muscular": grupo, "Exercício": ex,
+             "Carga (kg)": 50.0, "Repetições": 10, "Séries": 3, "Observações": ""}
+            for grupo, exercicios in plano[dia].items() for ex in exercicios
+        ])
+
+        def mudar_cargas():
+            treino_dia["Carga (kg)"] += 2.5  # Salvar de novo o mesmo treino não grava nada
+
+        def salvar():
+            app["queue_changes"](treino_dia, "treinos")
+        self.measure("salvar", linhas, salvar, preparar=mudar_cargas)
+        self.measure("salvar_sem_mudanca", linhas, salvar)
+        self.measure("salvar_com_conflito", linhas, salvar,
+                     preparar=lambda: (mudar_cargas(), self.servidor.fail_next(1)))
+
+        # Reimportar o próprio histórico: em regime, só leitura em blocos e comparação com o salvo
+        csv = df_treinos.to_csv(index=False).encode("utf-8")
+        self.measure("importar", linhas, lambda: app["import_csv"](BytesIO(csv), "treinos"))
+
+        for aba in ABAS:
+            chave, subabas = SUBABAS.get(aba, (None, [None]))
+            for subaba in subabas:
+                def preparar_aba():
+                    frio()
+                    self.app = AppTest.from_file(GYM_PATH, default_timeout=self.timeout)
+                    self.app.run()
+
+                def abrir(aba=aba, chave=chave, subaba=subaba):
+                    if subaba is not None:
+                        self.app.session_state[chave] = subaba
+                    self.app.sidebar.selectbox[0].select(aba).run()
+                    if self.app.exception:
+                        raise RuntimeError(f"{aba}: {self.app.exception[0].message}")
+                nome = aba if subaba is None else f"{aba} / {subaba}"
+                self.measure(f"aba_fria:{nome}", linhas, abrir, preparar=preparar_aba)
+                self.measure(f"aba_quente:{nome}", linhas, lambda: self.app.run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="tamanhos do histórico de treinos (1k a 1M)")
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos somados a cada resposta do servidor")
+    parser.add_argument("--taxa-conflito", type=float, default=0.0, help="probabilidade de conflito em cada gravação")
+    parser.add_argument("--limite", type=int, default=None, help="requisições por hora antes do 403 de rate limit")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=600, help="segundos por execução do AppTest")
+    parser.add_argument("--saida", help="arquivo JSON de resultados (padrão: stdout)")
+    args = parser.parse_args()
+
+    # Sem os avisos do modo "bare" e de depreciação, que se repetem a cada execução (o Streamlit
+    # relê a própria configuração e volta o nível dos loggers, então o corte é global)
+    logging.disable(logging.WARNING)
+    servidor = FakeGitHub(latencia=args.latencia, taxa_conflito=args.taxa_conflito, limite=args.limite).start()
+    temp = tempfile.mkdtemp(prefix="gym-bench-")
+    os.environ.update({
+        "GITHUB_API_URL": servidor.url,
+        "GITHUB_TOKEN": os.environ.get("GITHUB_TOKEN", "bench"),
+        # Gravações síncronas: o escritor em segundo plano esconderia o custo que queremos medir
+        "GYM_WRITE_BEHIND": "0",
+        "GYM_JOURNAL_PATH": os.path.join(temp, "pending_writes.jsonl"),
+        "GYM_SQLITE_PATH": os.environ.get("GYM_SQLITE_PATH", os.path.join(temp, "gym.db")),
+        "GYM_SQLITE_SYNC_INTERVAL": "0"
+    })
+
+    # Executa o gym.py uma vez fora do Streamlit só para ter acesso às funções; run_path devolve
+    # uma cópia dos globais, então usamos os das próprias funções (onde mudar a config tem efeito)
+    app = runpy.run_path(GYM_PATH, run_name="gym_bench")["load_data"].__globals__
+    bench = Bench(servidor, args.repeticoes, args.timeout)
+    try:
+        for linhas in args.linhas:
+            bench.run_size(linhas, app)
+    finally:
+        servidor.stop()
+
+    saida = {
+        "meta": {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "streamlit": st.__version__,
+            "latencia": args.latencia,
+            "taxa_conflito": args.taxa_conflito,
+            "limite": args.limite,
+            "repeticoes": args.repeticoes,
+            "config": {k: v for k, v in sorted(os.environ.items()) if k.startswith("GYM_") and "PATH" not in k}
+        },
+        "resultados": bench.resultados
+    }
+    texto = json.dumps(saida, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Gerador de históricos sintéticos (treinos e progresso) para os benchmarks do gym.py.
+
+Os treinos seguem o plano padrão `TREINO_PADRAO` do app: cada semana repete os dias,
+grupos e exercícios do plano, com cargas que sobem devagar ao longo do tempo.
+
+    python bench/synthetic.py --linhas 100000 --saida /tmp/historico
+"""
+import argparse
+import ast
+import os
+
+import numpy as np
+import pandas as pd
+
+GYM_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gym.py")
+DIAS_SEMANA = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
+HUMORES = ["😭", "😞", "😐", "🙂", "😁"]
+MAX_SEMANAS = 52 * 20  # Acima de 20 anos de histórico, as séries passam a ser registradas em várias linhas por dia
+OBSERVACOES = ["", "", "", "", "Boa execução", "Aumentar carga", "Dor no ombro", "Drop set na última série"]
+
+
+def load_plan(path=GYM_PATH):
+    """Lê o TREINO_PADRAO do gym.py sem executar o app (o arquivo roda a interface ao ser importado)"""
+    with open(path, encoding="utf-8") as f:
+        arvore = ast.parse(f.read())
+    for node in arvore.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "TREINO_PADRAO" for t in node.targets):
+            return ast.literal_eval(node.value)
+    raise ValueError(f"TREINO_PADRAO não encontrado em {path}")
+
+
+def _week_template(plano):
+    """Linhas de uma semana do plano: (dia da semana 0-6, dia, grupo, exercício)"""
+    linhas = []
+    for dia in sorted(plano, key=DIAS_SEMANA.index):
+        for grupo, exercicios in plano[dia].items():
+            for exercicio in exercicios:
+                linhas.append((DIAS_SEMANA.index(dia), dia, grupo, exercicio))
+    return pd.DataFrame(linhas, columns=["weekday", "Dia", "Grupo Muscular", "Exercício"])
+
+
+def generate_treinos(linhas, plano=None, fim=None, seed=0):
+    """Histórico de treinos com `linhas` linhas terminando até `fim` (padrão: hoje)"""
+    plano = plano or load_plan()
+    rng = np.random.default_rng(seed)
+    semana = _week_template(plano)
+    if semana.empty or linhas <= 0:
+        return pd.DataFrame(columns=["Data", "Dia", "Grupo Muscular", "Exercício", "Carga (kg)",
+                                     "Repetições", "Séries", "Observações"])
+
+    # Em históricos enormes o mesmo exercício aparece várias vezes no dia, em vez de séculos de datas
+    por_dia = max(1, -(-linhas // (len(semana) * MAX_SEMANAS)))
+    semana = semana.loc[semana.index.repeat(por_dia)].reset_index(drop=True)
+    semanas = -(-linhas // len(semana))
+    fim = pd.Timestamp(fim or pd.Timestamp.now()).normalize()
+    segunda_final = fim - pd.Timedelta(days=fim.weekday())
+    indice_semana = np.repeat(np.arange(semanas), len(semana))[:linhas]
+    modelo = np.tile(np.arange(len(semana)), semanas)[:linhas]
+    df = semana.iloc[modelo].reset_index(drop=True)
+
+    # Semana 0 é a mais antiga; a última cai na semana de `fim`
+    inicio = segunda_final - pd.Timedelta(weeks=semanas - 1)
+    df.insert(0, "Data", inicio + pd.to_timedelta(indice_semana * 7 + df["weekday"].to_numpy(), unit="D"))
+    if df["Data"].max() > fim:
+        # Sem datas no futuro: recua uma semana se o plano passa de `fim`
+        df["Data"] -= pd.Timedelta(weeks=1)
+
+    # Carga base por exercício, progressão lenta (até +60%) e ruído, arredondada para anilhas de 2,5 kg
+    exercicios = semana["Exercício"].unique()
+    base = dict(zip(exercicios, rng.uniform(10, 100, len(exercicios))))
+    progresso = 1 + 0.6 * indice_semana / max(semanas - 1, 1)
+    carga = df["Exercício"].map(base).to_numpy() * progresso + rng.normal(0, 2, linhas)
+    df["Carga (kg)"] = np.maximum(0, np.round(carga / 2.5) * 2.5)
+    df["Repetições"] = rng.integers(6, 16, linhas)
+    df["Séries"] = rng.integers(3, 5, linhas)
+    df["Observações"] = rng.choice(OBSERVACOES, linhas)
+    df["Data"] = df["Data"].dt.strftime("%Y-%m-%d")
+    return df.drop(columns="weekday")
+
+
+def generate_progresso(linhas, fim=None, seed=0):
+    """Registro diário de progresso com `linhas` linhas terminando em `fim` (padrão: hoje)"""
+    rng = np.random.default_rng(seed + 1)
+    fim = pd.Timestamp(fim or pd.Timestamp.now()).normalize()
+    linhas = max(linhas, 0)
+    por_dia = max(1, -(-linhas // (MAX_SEMANAS * 7)))
+    dias = pd.date_range(end=fim, periods=-(-linhas // por_dia), freq="D")
+    datas = dias.repeat(por_dia)[-linhas:] if linhas else dias
+    tendencia = np.linspace(0, -5, len(datas))
+    return pd.DataFrame({
+        "Data": datas.strftime("%Y-%m-%d"),
+        "Peso (kg)": np.round(80 + tendencia + rng.normal(0, 0.4, len(datas)), 1),
+        "Horas de Sono": np.round(rng.normal(7, 1, len(datas)).clip(3, 11) * 2) / 2,
+        "Cansaço": rng.integers(0, 11, len(datas)),
+        "Humor": rng.choice(HUMORES, len(datas)),
+        "Calorias": rng.integers(1800, 3200, len(datas)),
+        "Água (copos)": rng.integers(0, 13, len(datas))
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=10_000, help="linhas de treinos (e dias de progresso)")
+    parser.add_argument("--saida", default="bench_data", help="diretório onde gravar treinos.csv e progresso.csv")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.saida, exist_ok=True)
+    generate_treinos(args.linhas, seed=args.seed).to_csv(os.path.join(args.saida, "treinos.csv"), index=False)
+    generate_progresso(args.linhas, seed=args.seed).to_csv(os.path.join(args.saida, "progresso.csv"), index=False)
+    print(f"{args.linhas} linhas gravadas em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
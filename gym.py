@@ -1,12 +1,38 @@
 import os
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
 import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
 import base64
+import hashlib
+import copy
 import requests
+from requests.adapters import HTTPAdapter
 import json
-from io import StringIO
+import sqlite3
+import threading
+import time
+import uuid
+import re
+import unicodedata
+import contextvars
+import functools
+import logging
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet é opcional: sem pyarrow todas as tabelas ficam em CSV
+    pa = pq = None
 
 # Configuração da página
 st.set_page_config(
@@ -31,85 +57,2140 @@ st.markdown("""
 GITHUB_TOKEN = os.environ.get("GITHUB_TOKEN", "")  # Adicione no Render.com > Settings > Secrets
 GITHUB_REPO = "drygs/okok"  # Ex: "joaosilva/gym-data"
 GITHUB_BRANCH = "main"
+GITHUB_API_URL = os.environ.get("GITHUB_API_URL", "https://api.github.com")
 DATA_FILES = {
     "treinos": "data/treinos.csv",
     "progresso": "data/progresso.csv",
-    "metas": "data/metas.csv"
+    "metas": "data/metas.csv",
+    "resumo": "data/resumo.csv"  # Índice agregado por exercício, derivado de treinos
 }
 
-def get_file_sha(path):
-    """Obtém o SHA de um arquivo existente no repositório"""
-    url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/{path}?ref={GITHUB_BRANCH}"
-    headers = {
-        "Authorization": f"token {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json"
+# 🗂️ Armazenamento particionado (append-only, um arquivo por mês)
+STORAGE_MODE = os.environ.get("GYM_STORAGE_MODE", "arquivo")  # "arquivo" (um CSV por tabela) ou "particionado"
+PARTITIONED_DIRS = {
+    "treinos": "data/treinos",
+    "progresso": "data/progresso"
+}
+
+# 👥 Vários usuários: cada um com seus próprios arquivos em data/usuarios/<id>/
+MULTI_USER = os.environ.get("GYM_MULTI_USER", "0") == "1"
+USERS_DIR = "data/usuarios"
+USERS_MANIFEST = "data/usuarios.json"  # Lista de usuários e metadados de cada shard
+DEFAULT_USER = os.environ.get("GYM_DEFAULT_USER", "principal")  # Dono dos arquivos em data/ (layout de um usuário só)
+
+# 🧊 Formato dos arquivos: "csv" (texto legível) ou "parquet" (colunar e comprimido, requer pyarrow)
+STORAGE_FORMAT = os.environ.get("GYM_STORAGE_FORMAT", "csv")
+FILE_FORMATS = {file_key: os.environ.get(f"GYM_FORMAT_{file_key.upper()}", STORAGE_FORMAT) for file_key in DATA_FILES}
+PARQUET_COMPRESSION = os.environ.get("GYM_PARQUET_COMPRESSION", "zstd")
+PARQUET_ROW_GROUP_SIZE = int(os.environ.get("GYM_PARQUET_ROW_GROUP_SIZE", "1000"))  # Linhas por grupo (cada um com mín/máx de Data)
+
+# 🌐 Cliente HTTP do GitHub
+HTTP_TIMEOUT = (3.05, 20)  # Segundos (conexão, leitura)
+HTTP_MAX_RETRIES = 4  # Novas tentativas em 5xx, 429 e limites de requisição
+HTTP_BACKOFF = 0.5  # Segundos; dobra a cada tentativa
+HTTP_MAX_WAIT = 30  # Acima disso desiste em vez de esperar o limite renovar
+LOAD_WORKERS = 3  # Threads para carregar várias tabelas em paralelo
+
+# 🔒 Concorrência otimista nas gravações
+SAVE_CONFLICT_RETRIES = 3  # Tentativas extras quando outro dispositivo salvou antes (409/422)
+SAVE_CONFLICT_BACKOFF = 0.5  # Segundos; dobra a cada tentativa
+
+# 🧱 Esquema de cada tabela: colunas em ordem e tipo compacto ("date" = datas lidas uma única vez no load)
+SCHEMAS = {
+    "treinos": {
+        "Data": "date", "Dia": "category", "Grupo Muscular": "category", "Exercício": "category",
+        "Carga (kg)": "float32", "Repetições": "Int16", "Séries": "Int16", "Observações": "string"
+    },
+    "progresso": {
+        "Data": "date", "Peso (kg)": "float32", "Horas de Sono": "float32", "Cansaço": "Int16",
+        "Humor": "category", "Calorias": "float32", "Água (copos)": "Int16"
+    },
+    "metas": {"Meta": "string", "Valor": "float32", "Atual": "float32"},
+    "resumo": {
+        "Exercício": "string", "Carga Máx (kg)": "float32", "Carga Inicial (kg)": "float32",
+        "Carga Final (kg)": "float32", "Média Recente (kg)": "float32", "Últimas Cargas": "string",
+        "Volume Total (kg)": "float64", "1RM Estimado (kg)": "float32", "Sessões": "Int32",
+        "Data Inicial": "date", "Data Final": "date"
     }
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        return response.json()["sha"]
-    return None
+}
+COLUNAS = {file_key: list(schema) for file_key, schema in SCHEMAS.items()}
+DATE_FORMAT = "%Y-%m-%d"  # Formato das datas nos arquivos
+DATE_FORMAT_BR = "%d/%m/%Y"  # Formato exibido no app; aceito também na importação
+
+# 🔑 Chave de cada linha, usada para mesclar gravações concorrentes
+ROW_KEYS = {
+    "treinos": ["Data", "Exercício"],
+    "progresso": ["Data"],
+    "metas": ["Meta"],
+    "resumo": ["Exercício"]
+}
+
+# ⚡ Cache de leitura (sobrevive aos reruns do Streamlit)
+CACHE_TTL_SECONDS = float(os.environ.get("GYM_CACHE_TTL", "60"))  # Tempo até revalidar com o GitHub
+CACHE_MAX_ENTRIES = int(os.environ.get("GYM_CACHE_MAX_ENTRIES", "512"))  # Arquivos no cache; cabe uma partição por mês de vários anos
+
+@st.cache_resource
+def _get_read_cache():
+    """Cache global do processo: caminho -> {data, etag, sha, checked_at} em ordem LRU"""
+    return {"entries": OrderedDict(), "lock": threading.Lock()}
+
+def _cache_get(path):
+    """Retorna a entrada do cache (marcando como usada recentemente) ou None"""
+    cache = _get_read_cache()
+    with cache["lock"]:
+        entry = cache["entries"].get(path)
+        if entry is not None:
+            cache["entries"].move_to_end(path)
+        return entry
+
+def _cache_put(path, data, etag=None, sha=None):
+    """Guarda o conteúdo interpretado no cache, removendo as entradas menos usadas acima do limite"""
+    cache = _get_read_cache()
+    with cache["lock"]:
+        cache["entries"][path] = {
+            "data": data,
+            "etag": etag,
+            "sha": sha,
+            "checked_at": time.monotonic()
+        }
+        cache["entries"].move_to_end(path)
+        while len(cache["entries"]) > CACHE_MAX_ENTRIES:
+            cache["entries"].popitem(last=False)
+
+def _cache_touch(path):
+    """Renova o prazo de uma entrada revalidada pelo GitHub (resposta 304)"""
+    cache = _get_read_cache()
+    with cache["lock"]:
+        entry = cache["entries"].get(path)
+        if entry is not None:
+            entry["checked_at"] = time.monotonic()
+
+def invalidate_cache(path=None):
+    """Remove uma entrada do cache (ou todas, se path for None)"""
+    cache = _get_read_cache()
+    with cache["lock"]:
+        if path is None:
+            cache["entries"].clear()
+        else:
+            cache["entries"].pop(path, None)
+
+def _copy(data):
+    """Cópia defensiva para que quem chama possa alterar o resultado sem sujar o cache"""
+    return data.copy() if isinstance(data, pd.DataFrame) else copy.deepcopy(data)
+
+def coerce_schema(df, file_key, colunas=None):
+    """Converte o DataFrame para o esquema da tabela: colunas em ordem, tipos compactos e datas já interpretadas"""
+    colunas = colunas or COLUNAS[file_key]
+    df = df.reindex(columns=colunas)
+    convertidas = {}
+    for coluna in colunas:
+        tipo, serie = SCHEMAS[file_key][coluna], df[coluna]
+        if str(serie.dtype) == tipo or (tipo == "date" and pd.api.types.is_datetime64_any_dtype(serie)):
+            convertidas[coluna] = serie
+        elif tipo == "date":
+            # Só ISO (AAAA-MM-DD): sem adivinhar a ordem de dia e mês a partir do primeiro valor
+            convertidas[coluna] = pd.to_datetime(serie, format="ISO8601", errors="coerce")
+        elif tipo in ("category", "string"):
+            convertidas[coluna] = serie.astype("string").astype(tipo)
+        elif tipo.startswith("Int"):
+            # Fracionários e fora da faixa viram vazios (check_schema os conta como inválidos)
+            numeros = pd.to_numeric(serie, errors="coerce").astype("float64")
+            limites = np.iinfo(tipo.lower())
+            validos = (numeros % 1 == 0) & numeros.between(limites.min, limites.max)
+            convertidas[coluna] = numeros.where(validos).astype(tipo)
+        else:
+            convertidas[coluna] = pd.to_numeric(serie, errors="coerce").astype(tipo)
+    return pd.DataFrame(convertidas, index=df.index)
 
-def load_data_from_github(file_key):
-    """Carrega dados do arquivo CSV no GitHub ou retorna DataFrame vazio"""
-    path = DATA_FILES[file_key]
-    url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/{path}?ref={GITHUB_BRANCH}"
-    headers = {
+def check_schema(df, file_key):
+    """Confere um arquivo externo contra o esquema; retorna (DataFrame convertido, {problema: linhas afetadas}).
+    
+    Problemas de colunas contam 0 linhas; as contagens de vários blocos do mesmo arquivo podem ser somadas.
+    """
+    problemas = Counter()
+    faltando = [coluna for coluna in COLUNAS[file_key] if coluna not in df.columns]
+    if faltando:
+        problemas[f"Colunas ausentes (preenchidas vazias): {', '.join(faltando)}"] += 0
+    extras = [coluna for coluna in df.columns if coluna not in SCHEMAS[file_key]]
+    if extras:
+        problemas[f"Colunas ignoradas: {', '.join(map(str, extras))}"] += 0
+    
+    convertido = coerce_schema(df, file_key)
+    for coluna, tipo in SCHEMAS[file_key].items():
+        if coluna in df.columns and tipo not in ("category", "string", "date"):
+            invalidos = int((convertido[coluna].isna() & df[coluna].notna()).sum())
+            if invalidos:
+                problemas[f"valor(es) inválido(s) em {coluna}"] += invalidos
+    if "Data" in convertido.columns:
+        sem_data = convertido["Data"].isna()
+        if "Data" in df.columns and sem_data.any():
+            # Fora do ISO aceita só dd/mm/aaaa, com dia primeiro, e avisa quantas foram convertidas
+            br = pd.to_datetime(df["Data"].where(sem_data), format=DATE_FORMAT_BR, errors="coerce")
+            if br.notna().any():
+                convertido.loc[br.notna(), "Data"] = br[br.notna()]
+                problemas["data(s) em dd/mm/aaaa convertida(s)"] += int(br.notna().sum())
+                sem_data = convertido["Data"].isna()
+        if sem_data.any():
+            problemas["linha(s) sem data válida descartada(s)"] += int(sem_data.sum())
+            convertido = convertido[~sem_data].reset_index(drop=True)
+    return convertido, problemas
+
+def describe_problems(problemas):
+    """Mensagens legíveis a partir das contagens de check_schema"""
+    return [f"{n} {problema}" if n else problema for problema, n in problemas.items()]
+
+def to_csv_text(df, file_key):
+    """Serializa no formato dos arquivos (datas AAAA-MM-DD)"""
+    return coerce_schema(df, file_key).to_csv(index=False, date_format=DATE_FORMAT)
+
+def as_float64(df):
+    """Colunas float32 em float64 arredondado, para exibir e gravar 52.4 (e não 52.400001525878906)"""
+    colunas = df.select_dtypes("float32").columns
+    if len(colunas) == 0:
+        return df
+    df = df.copy()
+    df[colunas] = df[colunas].astype("float64").round(3)
+    return df
+
+def to_records(df, file_key):
+    """Linhas como escalares Python (datas em texto), para SQLite e para o diário local"""
+    df = as_float64(coerce_schema(df, file_key))
+    for coluna, tipo in SCHEMAS[file_key].items():
+        if tipo == "date":
+            df[coluna] = df[coluna].dt.strftime(DATE_FORMAT)
+    df = df.astype(object)
+    return df.where(df.notna(), None).to_dict(orient="records")
+
+def _csv_parser(file_key):
+    """Parser de CSV que já devolve a tabela no esquema (usado pelo cache de leitura)"""
+    def parse(raw):
+        return coerce_schema(pd.read_csv(BytesIO(raw)), file_key)
+    return parse
+
+def _empty_frame(file_key, colunas=None):
+    return coerce_schema(pd.DataFrame(columns=COLUNAS[file_key]), file_key, colunas)
+
+def file_format(file_key):
+    """Formato efetivo da tabela; cai para CSV quando o pyarrow não está instalado"""
+    return "parquet" if FILE_FORMATS.get(file_key) == "parquet" and pq is not None else "csv"
+
+def _with_format(path, file_key):
+    """Troca a extensão .csv do caminho pela do formato configurado para a tabela"""
+    if file_format(file_key) == "parquet":
+        return path[:-len(".csv")] + ".parquet"
+    return path
+
+def to_parquet_bytes(df, file_key):
+    """Serializa em Parquet comprimido, em grupos de linhas com estatísticas (mín/máx) por coluna"""
+    tabela = pa.Table.from_pandas(coerce_schema(df, file_key), preserve_index=False)
+    buffer = BytesIO()
+    pq.write_table(tabela, buffer, compression=PARQUET_COMPRESSION,
+                   row_group_size=PARQUET_ROW_GROUP_SIZE, write_statistics=True)
+    return buffer.getvalue()
+
+def _serialize(df, file_key, path):
+    return to_parquet_bytes(df, file_key) if path.endswith(".parquet") else to_csv_text(df, file_key)
+
+def _table_parser(path, file_key):
+    """Parser do cache: CSV vira DataFrame tipado; Parquet fica em bytes para ser lido com projeção"""
+    return None if path.endswith(".parquet") else _csv_parser(file_key)
+
+def read_frame(data, file_key, colunas=None, desde=None, ate=None):
+    """DataFrame tipado a partir do conteúdo em cache, só com as colunas e o intervalo de datas pedidos.
+    
+    Em Parquet só as colunas pedidas são decodificadas, e os grupos de linhas cujas
+    estatísticas de Data ficam fora do intervalo nem são lidos.
+    """
+    if isinstance(data, bytes):
+        filtros = []
+        if desde is not None:
+            filtros.append(("Data", ">=", pd.Timestamp(desde).normalize()))
+        if ate is not None:
+            filtros.append(("Data", "<=", pd.Timestamp(ate).normalize()))
+        tabela = pq.read_table(pa.BufferReader(data), columns=colunas, filters=filtros or None)
+        return coerce_schema(tabela.to_pandas(), file_key, colunas)
+    if desde is not None or ate is not None:
+        data = _apply_filters(data, desde=desde, ate=ate)
+    return data if colunas is None else data[colunas]
+
+# 🩺 Instrumentação: tempos, bytes e limite de requisições do GitHub num buffer circular em memória
+METRICS_BUFFER_SIZE = int(os.environ.get("GYM_METRICS_BUFFER", "500"))  # Eventos guardados para o painel de diagnóstico
+METRICS_LOG = os.environ.get("GYM_METRICS_LOG", "")  # "json" registra cada evento como uma linha JSON no log
+METRICS_PORT = int(os.environ.get("GYM_METRICS_PORT", "0"))  # Porta do endpoint /metrics (Prometheus); 0 desliga
+RATE_LIMIT_WARN = int(os.environ.get("GYM_RATE_LIMIT_WARN", "100"))  # Avisa quando restarem menos requisições que isso
+
+class Metrics:
+    """Eventos recentes (buffer circular) e totais acumulados por operação, seguros entre threads"""
+    
+    def __init__(self, tamanho):
+        self.lock = threading.Lock()
+        self.eventos = deque(maxlen=tamanho)
+        self.totais = {}  # operacao -> {"count", "segundos", "bytes", "erros"}
+        self.http = Counter()  # (método, status) -> requisições
+        self.rate_limit = {}  # Último X-RateLimit-* visto: restantes, limite, reinicio
+        self.offline = {}  # Sem conexão com o GitHub: desde, ultima_falha (vazio quando a última chamada respondeu)
+        self.logger = logging.getLogger("gym.metrics")
+    
+    def record(self, operacao, segundos, alvo=None, bytes=None, status=None, erro=False, **extras):
+        evento = {"ts": time.time(), "operacao": operacao, "alvo": alvo, "segundos": round(segundos, 6),
+                  "bytes": bytes, "status": status, "erro": erro, **extras}
+        with self.lock:
+            self.eventos.append(evento)
+            total = self.totais.setdefault(operacao, {"count": 0, "segundos": 0.0, "bytes": 0, "erros": 0})
+            total["count"] += 1
+            total["segundos"] += segundos
+            total["bytes"] += bytes or 0
+            total["erros"] += int(erro)
+        if METRICS_LOG == "json":
+            self.logger.info(json.dumps(evento, ensure_ascii=False, default=str))
+        return evento
+    
+    def record_http(self, metodo, url, response, segundos):
+        """Registra uma chamada ao GitHub e atualiza o limite de requisições restante"""
+        status = response.status_code if response is not None else None
+        restantes = response.headers.get("X-RateLimit-Remaining") if response is not None else None
+        agora = time.time()
+        with self.lock:
+            self.http[(metodo, status)] += 1
+            if response is None:
+                self.offline = {"desde": self.offline.get("desde", agora), "ultima_falha": agora}
+            else:
+                self.offline = {}
+            if restantes is not None:
+                self.rate_limit = {
+                    "restantes": int(restantes),
+                    "limite": int(response.headers.get("X-RateLimit-Limit", 0)),
+                    "reinicio": int(response.headers.get("X-RateLimit-Reset", 0))
+                }
+        alvo = url.replace(f"{GITHUB_API_URL}/repos/{GITHUB_REPO}/", "").split("?")[0]
+        self.record("http", segundos, alvo=f"{metodo} {alvo}",
+                    bytes=len(response.content) if response is not None else None, status=status,
+                    erro=status is None or status >= 400, restantes=int(restantes) if restantes is not None else None)
+    
+    def recent(self, n=None):
+        with self.lock:
+            eventos = list(self.eventos)
+        return pd.DataFrame(eventos[-n:] if n else eventos)
+    
+    def summary(self):
+        """Estatísticas por operação sobre os eventos do buffer (contagem, p50, p95, máximo, bytes)"""
+        df = self.recent()
+        if df.empty:
+            return df
+        g = df.groupby("operacao")
+        return pd.DataFrame({
+            "Chamadas": g.size(),
+            "p50 (ms)": g["segundos"].median() * 1000,
+            "p95 (ms)": g["segundos"].quantile(0.95) * 1000,
+            "Máx (ms)": g["segundos"].max() * 1000,
+            "Total (s)": g["segundos"].sum(),
+            "Bytes": g["bytes"].sum(min_count=1),
+            "Erros": g["erro"].sum()
+        }).sort_values("Total (s)", ascending=False).reset_index()
+    
+    def prometheus_text(self):
+        """Totais no formato de exposição de texto do Prometheus"""
+        with self.lock:
+            totais = {op: dict(t) for op, t in self.totais.items()}
+            http = dict(self.http)
+            rate_limit = dict(self.rate_limit)
+        linhas = []
+        for nome, campo, ajuda in [
+            ("gym_operation_total", "count", "Operações registradas"),
+            ("gym_operation_seconds_total", "segundos", "Tempo gasto por operação"),
+            ("gym_operation_bytes_total", "bytes", "Bytes transferidos ou processados por operação"),
+            ("gym_operation_errors_total", "erros", "Operações com erro")
+        ]:
+            linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} counter"]
+            linhas += [f'{nome}{{operacao="{op}"}} {t[campo]}' for op, t in sorted(totais.items())]
+        linhas += ["# HELP gym_github_requests_total Requisições ao GitHub por método e status",
+                   "# TYPE gym_github_requests_total counter"]
+        linhas += [f'gym_github_requests_total{{method="{m}",status="{s}"}} {n}' for (m, s), n in sorted(http.items(), key=str)]
+        if rate_limit:
+            for chave, nome in [("restantes", "remaining"), ("limite", "limit"), ("reinicio", "reset_timestamp")]:
+                linhas += [f"# TYPE gym_github_rate_limit_{nome} gauge", f"gym_github_rate_limit_{nome} {rate_limit[chave]}"]
+        return "\n".join(linhas) + "\n"
+    
+    def reset(self):
+        with self.lock:
+            self.eventos.clear()
+            self.totais.clear()
+            self.http.clear()
+
+def _serve_metrics(metrics, porta):
+    """Endpoint HTTP mínimo com /metrics, numa thread à parte do servidor do Streamlit"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            corpo = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer(("0.0.0.0", porta), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="gym-metrics").start()
+    return server
+
+@st.cache_resource
+def get_metrics():
+    """Instrumentação do processo (compartilhada entre sessões e reruns)"""
+    metrics = Metrics(METRICS_BUFFER_SIZE)
+    if METRICS_LOG == "json" and not metrics.logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        metrics.logger.addHandler(handler)
+        metrics.logger.setLevel(logging.INFO)
+        metrics.logger.propagate = False
+    if METRICS_PORT:
+        try:
+            _serve_metrics(metrics, METRICS_PORT)
+        except OSError as e:
+            # Outro processo já usa a porta: segue sem o endpoint
+            metrics.logger.warning(f"Endpoint de métricas indisponível na porta {METRICS_PORT}: {e}")
+    return metrics
+
+@contextmanager
+def timed(operacao, alvo=None, **campos):
+    """Mede o bloco e registra o evento; quem chama pode preencher bytes/status no dict retornado"""
+    evento = dict(campos)
+    inicio = time.perf_counter()
+    erro = False
+    try:
+        yield evento
+    except BaseException:
+        erro = True
+        raise
+    finally:
+        get_metrics().record(operacao, time.perf_counter() - inicio, alvo=alvo, erro=erro or evento.pop("erro", False), **evento)
+
+def instrumented(operacao):
+    """Decorador: mede cada chamada; o primeiro argumento em texto (file_key, visão) vira o alvo"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            alvo = args[0] if args and isinstance(args[0], str) else None
+            with timed(operacao, alvo=alvo):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@st.cache_resource
+def _get_http_session():
+    """Sessão HTTP compartilhada pelo processo: reaproveita conexões (keep-alive) com o GitHub"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(LOAD_WORKERS, 4) * 2)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
         "Authorization": f"token {GITHUB_TOKEN}",
         "Accept": "application/vnd.github.v3+json"
+    })
+    return session
+
+def _retry_delay(response, tentativa):
+    """Espera antes de repetir: Retry-After, depois X-RateLimit-Reset, senão backoff exponencial"""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        if response.headers.get("X-RateLimit-Remaining") == "0" and response.headers.get("X-RateLimit-Reset"):
+            return max(0.0, float(response.headers["X-RateLimit-Reset"]) - time.time())
+    return HTTP_BACKOFF * (2 ** tentativa)
+
+def _is_retryable(response):
+    if response.status_code >= 500 or response.status_code == 429:
+        return True
+    # Limite primário esgotado ou limite secundário (abuso) chegam como 403
+    return response.status_code == 403 and (
+        response.headers.get("X-RateLimit-Remaining") == "0" or "Retry-After" in response.headers
+    )
+
+def _github_request(method, url, **kwargs):
+    """Requisição ao GitHub pela sessão compartilhada, com timeout e novas tentativas"""
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+    session = _get_http_session()
+    for tentativa in range(HTTP_MAX_RETRIES + 1):
+        inicio = time.perf_counter()
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            get_metrics().record_http(method, url, None, time.perf_counter() - inicio)
+            if tentativa == HTTP_MAX_RETRIES:
+                raise
+            response = None
+        else:
+            get_metrics().record_http(method, url, response, time.perf_counter() - inicio)
+            if not _is_retryable(response) or tentativa == HTTP_MAX_RETRIES:
+                return response
+        espera = _retry_delay(response, tentativa)
+        if espera > HTTP_MAX_WAIT:
+            # Não vale travar a página esperando o limite de requisições voltar
+            return response
+        time.sleep(espera)
+    return response
+
+def _git_api(method, endpoint, payload=None):
+    url = f"{GITHUB_API_URL}/repos/{GITHUB_REPO}/git/{endpoint}"
+    data = json.dumps(payload) if payload is not None else None
+    return _github_request(method, url, data=data)
+
+class NotCached(Exception):
+    """Arquivo fora do cache numa leitura restrita a ele (cached_only)"""
+
+@st.cache_resource
+def _cache_mode_context():
+    """Modo de leitura do escopo atual ("cache", "revalidar" ou None); único no processo, como o escopo de usuário"""
+    return contextvars.ContextVar("gym_cache_mode", default=None)
+
+@contextmanager
+def _cache_mode(modo):
+    contexto = _cache_mode_context()
+    token = contexto.set(modo)
+    try:
+        yield
+    finally:
+        contexto.reset(token)
+
+def cached_only():
+    """Dentro do bloco as leituras do GitHub usam só o cache, mesmo vencido, e nunca a rede"""
+    return _cache_mode("cache")
+
+def revalidated():
+    """Dentro do bloco toda leitura confere o ETag com o GitHub, mesmo dentro do TTL"""
+    return _cache_mode("revalidar")
+
+def _read_github_file(path, parser):
+    """Lê um arquivo do GitHub passando pelo cache de ETag; retorna (status, conteúdo interpretado ou bytes sem parser)"""
+    url = f"{GITHUB_API_URL}/repos/{GITHUB_REPO}/contents/{path}?ref={GITHUB_BRANCH}"
+    headers = {}
+    
+    entry = _cache_get(path)
+    modo = _cache_mode_context().get()
+    if modo == "cache":
+        if entry is None:
+            raise NotCached(path)
+        return 200, _copy(entry["data"])
+    
+    # Logo depois de uma queda de conexão não vale esperar de novo todas as tentativas em cada arquivo
+    falha = get_metrics().offline.get("ultima_falha")
+    if modo != "revalidar" and falha is not None and time.time() - falha < CACHE_TTL_SECONDS:
+        return (200, _copy(entry["data"])) if entry is not None else (503, None)
+    
+    # Dentro do TTL o cache responde sem tocar na rede
+    if entry is not None:
+        if modo != "revalidar" and time.monotonic() - entry["checked_at"] < CACHE_TTL_SECONDS:
+            return 200, _copy(entry["data"])
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+    
+    try:
+        response = _github_request("GET", url, headers=headers)
+    except requests.RequestException:
+        # Sem conexão: serve a cópia vencida, se houver (o aviso aparece na barra lateral)
+        if entry is not None:
+            return 200, _copy(entry["data"])
+        return 503, None
+    
+    if response.status_code == 304 and entry is not None:
+        # Arquivo não mudou: 304 não consome o limite de requisições
+        _cache_touch(path)
+        return 200, _copy(entry["data"])
+    elif response.status_code == 200:
+        payload = response.json()
+        if payload.get("encoding") == "none" or (not payload.get("content") and payload.get("size")):
+            # Acima de 1 MB a Contents API não traz o conteúdo: busca pela Blob API
+            try:
+                blob = _git_api("GET", f"blobs/{payload['sha']}")
+            except requests.RequestException:
+                return (200, _copy(entry["data"])) if entry is not None else (503, None)
+            if blob.status_code != 200:
+                return blob.status_code, None
+            payload["content"] = blob.json()["content"]
+        with timed("decodificar", alvo=path) as evento:
+            decoded_content = base64.b64decode(payload["content"])
+            evento["bytes"] = len(decoded_content)
+        with timed("interpretar", alvo=path, bytes=len(decoded_content)):
+            data = parser(decoded_content) if parser else decoded_content
+        _cache_put(path, data, etag=response.headers.get("ETag"), sha=payload.get("sha"))
+        return 200, _copy(data)
+    if response.status_code == 404:
+        invalidate_cache(path)
+    return response.status_code, None
+
+def cached_sha(path):
+    """SHA do blob visto na última leitura/gravação do arquivo, sem tocar na rede"""
+    entry = _cache_get(path)
+    return entry["sha"] if entry is not None else None
+
+def _write_github_file(path, content, message, parsed, merge=None, parser=None):
+    """Grava um arquivo (texto ou bytes) no GitHub reaproveitando o SHA do cache (concorrência otimista).
+    
+    Em conflito (409/422) relê o arquivo remoto e, se houver `merge`, refaz o conteúdo com
+    merge(remoto) -> (content, parsed) antes de tentar de novo, com espera exponencial.
+    """
+    url = f"{GITHUB_API_URL}/repos/{GITHUB_REPO}/contents/{path}"
+    sha = cached_sha(path)
+    
+    for tentativa in range(SAVE_CONFLICT_RETRIES + 1):
+        data = {
+            "message": message,
+            "content": base64.b64encode(_as_bytes(content)).decode("utf-8"),
+            "branch": GITHUB_BRANCH
+        }
+        if sha:
+            data["sha"] = sha
+        
+        response = _github_request("PUT", url, data=json.dumps(data))
+        
+        if response.status_code in [200, 201]:
+            # Sem ETag, a próxima revalidação depois do TTL faz um GET completo
+            new_sha = response.json().get("content", {}).get("sha")
+            _cache_put(path, parsed, sha=new_sha)
+            return True
+        
+        invalidate_cache(path)
+        if response.status_code not in [409, 422] or tentativa == SAVE_CONFLICT_RETRIES:
+            break
+        
+        # Outro dispositivo gravou antes: busca o estado remoto e mescla as nossas linhas
+        time.sleep(SAVE_CONFLICT_BACKOFF * (2 ** tentativa))
+        status, remoto = _read_github_file(path, parser)
+        if status not in [200, 404]:
+            break
+        sha = cached_sha(path) if status == 200 else None
+        if merge is not None:
+            content, parsed = merge(remoto)
+    
+    st.error(f"Erro ao salvar dados no GitHub: {response.status_code}")
+    st.write(response.json())
+    return False
+
+def _merge_rows(remoto, local, file_key):
+    """Mescla por chave de linha: as chaves presentes em `local` vencem, o resto do remoto é preservado"""
+    if remoto is None or remoto.empty:
+        return local
+    chave = ROW_KEYS[file_key]
+    chaves_locais = pd.MultiIndex.from_frame(local[chave].astype("string"))
+    so_remoto = ~pd.MultiIndex.from_frame(remoto[chave].astype("string")).isin(chaves_locais)
+    df = pd.concat([local, remoto[so_remoto]], ignore_index=True)
+    if "Data" in chave:
+        df = df.sort_values("Data", kind="stable", ignore_index=True)
+    return df
+
+def _table_merger(local, file_key, path):
+    """Cria o callback de merge usado nas gravações de tabelas (CSV ou Parquet)"""
+    def merge(remoto):
+        if remoto is not None:
+            remoto = read_frame(remoto, file_key)
+        df = coerce_schema(_merge_rows(remoto, local, file_key), file_key)
+        content = _serialize(df, file_key, path)
+        return content, (content if isinstance(content, bytes) else df)
+    return merge
+
+def _change(content, parsed, merge=None, parser=None):
+    """Descreve a gravação de um arquivo num commit (content=None remove o arquivo)"""
+    return {"content": content, "parsed": parsed, "merge": merge, "parser": parser}
+
+def _table_change(df, file_key, path):
+    """Gravação de uma tabela no formato do caminho; em Parquet o cache guarda os próprios bytes"""
+    df = coerce_schema(df, file_key)
+    with timed("serializar", alvo=path) as evento:
+        content = _serialize(df, file_key, path)
+        evento["bytes"] = len(content)
+    parsed = content if isinstance(content, bytes) else df
+    return _change(content, parsed, merge=_table_merger(df, file_key, path), parser=_table_parser(path, file_key))
+
+def _as_bytes(content):
+    return content if isinstance(content, bytes) else content.encode("utf-8")
+
+def _git_blob_sha(content):
+    """SHA que o Git atribui ao blob, para manter o cache coerente sem outra requisição"""
+    data = _as_bytes(content)
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+def _remote_shas(base_tree):
+    """SHA de cada arquivo da árvore ({caminho: sha}); None se a listagem veio truncada"""
+    response = _git_api("GET", f"trees/{base_tree}?recursive=1")
+    if response.status_code != 200:
+        return response.status_code, None
+    payload = response.json()
+    if payload.get("truncated"):
+        return 200, None
+    return 200, {item["path"]: item["sha"] for item in payload["tree"] if item["type"] == "blob"}
+
+def _merge_remote(changes, paths):
+    """Relê os arquivos em `paths` e refaz o conteúdo das alterações com `merge` sobre o estado remoto"""
+    for path in paths:
+        change = changes[path]
+        invalidate_cache(path)
+        status, remoto = _read_github_file(path, change["parser"])
+        if status not in [200, 404]:
+            st.error(f"Erro ao carregar dados do GitHub: {status}")
+            return False
+        change["content"], change["parsed"] = change["merge"](remoto)
+    return True
+
+def commit_files_to_github(changes, message):
+    """Grava vários arquivos num único commit pela Git Data API (tree -> commit -> ref).
+    
+    Conteúdo texto vai embutido na árvore, que cria os blobs no mesmo POST; conteúdo
+    binário (Parquet) vira blob antes, em base64. Antes de montar a árvore compara o SHA
+    remoto de cada arquivo com `merge` ao que o cache viu: se outro dispositivo gravou
+    depois da nossa leitura, relê e mescla. Se o branch andou enquanto o commit era
+    montado, faz o mesmo e tenta de novo a partir do novo HEAD.
+    """
+    mesclaveis = [path for path, change in changes.items()
+                  if change["merge"] is not None and change["content"] is not None]
+    for tentativa in range(SAVE_CONFLICT_RETRIES + 1):
+        response = _git_api("GET", f"ref/heads/{GITHUB_BRANCH}")
+        if response.status_code != 200:
+            break
+        head = response.json()["object"]["sha"]
+        
+        response = _git_api("GET", f"commits/{head}")
+        if response.status_code != 200:
+            break
+        base_tree = response.json()["tree"]["sha"]
+        
+        if mesclaveis:
+            # O conteúdo veio do cache (até CACHE_TTL_SECONDS de idade): só a árvore diz se ainda é o atual
+            status, remotos = _remote_shas(base_tree)
+            if status != 200:
+                st.error(f"Erro ao carregar dados do GitHub: {status}")
+                return False
+            desatualizados = [path for path in mesclaveis
+                              if remotos is None or remotos.get(path) != cached_sha(path)]
+            if not _merge_remote(changes, desatualizados):
+                return False
+        
+        tree = []
+        for path, change in changes.items():
+            item = {"path": path, "mode": "100644", "type": "blob"}
+            if change["content"] is None:
+                item["sha"] = None
+            elif isinstance(change["content"], bytes):
+                blob = _git_api("POST", "blobs", {"content": base64.b64encode(change["content"]).decode("utf-8"),
+                                                  "encoding": "base64"})
+                if blob.status_code != 201:
+                    st.error(f"Erro ao salvar dados no GitHub: {blob.status_code}")
+                    return False
+                item["sha"] = blob.json()["sha"]
+            else:
+                item["content"] = change["content"]
+            tree.append(item)
+        
+        response = _git_api("POST", "trees", {"base_tree": base_tree, "tree": tree})
+        if response.status_code != 201:
+            break
+        
+        response = _git_api("POST", "commits", {"message": message, "tree": response.json()["sha"], "parents": [head]})
+        if response.status_code != 201:
+            break
+        
+        # Sem force: se outro commit entrou no branch o GitHub recusa com 422
+        response = _git_api("PATCH", f"refs/heads/{GITHUB_BRANCH}", {"sha": response.json()["sha"]})
+        if response.status_code == 200:
+            for path, change in changes.items():
+                if change["content"] is None:
+                    invalidate_cache(path)
+                else:
+                    _cache_put(path, change["parsed"], sha=_git_blob_sha(change["content"]))
+            return True
+        
+        if response.status_code != 422 or tentativa == SAVE_CONFLICT_RETRIES:
+            break
+        
+        # O próximo passo compara os SHAs da nova árvore e mescla o que mudou
+        time.sleep(SAVE_CONFLICT_BACKOFF * (2 ** tentativa))
+    
+    st.error(f"Erro ao salvar dados no GitHub: {response.status_code}")
+    return False
+
+def _commit_changes(changes, message):
+    """Uma única gravação vai pela Contents API (1 requisição); várias viram um só commit"""
+    if not changes:
+        return True
+    if len(changes) == 1:
+        path, change = next(iter(changes.items()))
+        if change["content"] is not None:
+            return _write_github_file(path, change["content"], message, change["parsed"],
+                                      merge=change["merge"], parser=change["parser"])
+    return commit_files_to_github(changes, message)
+
+@st.cache_resource
+def _user_context():
+    """Usuário do escopo atual; único no processo para valer também nas threads criadas em reruns anteriores"""
+    return contextvars.ContextVar("gym_usuario", default=None)
+
+def user_id(nome):
+    """Identificador seguro para caminhos: minúsculas, sem acentos, só letras, números, - e _"""
+    texto = unicodedata.normalize("NFKD", str(nome)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9_-]+", "-", texto.lower()).strip("-")
+
+def current_user():
+    """Usuário dono dos dados lidos e gravados agora: o do escopo explícito ou o da sessão"""
+    usuario = _user_context().get()
+    if usuario is None and MULTI_USER and get_script_run_ctx(suppress_warning=True) is not None:
+        usuario = st.session_state.get("usuario")
+    return usuario or DEFAULT_USER
+
+@contextmanager
+def user_scope(usuario):
+    """Lê e grava como `usuario` dentro do bloco (usado pelo escritor em segundo plano)"""
+    contexto = _user_context()
+    token = contexto.set(usuario)
+    try:
+        yield
+    finally:
+        contexto.reset(token)
+
+def user_path(path, usuario=None):
+    """Caminho do arquivo no shard do usuário; o usuário padrão mantém o layout original em data/"""
+    usuario = usuario or current_user()
+    if usuario == DEFAULT_USER:
+        return path
+    return f"{USERS_DIR}/{usuario}/{path.removeprefix('data/')}"
+
+def load_users():
+    """Usuários do manifesto ({id: metadados}); o padrão sempre aparece, mesmo sem manifesto"""
+    status, manifest = _read_github_file(USERS_MANIFEST, json.loads)
+    usuarios = manifest["usuarios"] if status == 200 else {}
+    if status not in (200, 404):
+        st.error(f"Erro ao carregar usuários do GitHub: {status}")
+    return {DEFAULT_USER: {"nome": DEFAULT_USER, "prefixo": "data"}, **usuarios}
+
+def register_user(nome, novo=False):
+    """Cria o shard de um usuário no manifesto (se ainda não existe) e retorna o id.
+    
+    O manifesto só muda quando alguém novo entra; as gravações do dia a dia ficam nos
+    arquivos do próprio usuário, então usuários diferentes nunca disputam o mesmo SHA.
+    Com `novo` (cadastro pela barra lateral) um id já usado é recusado, em vez de
+    levar a pessoa para o shard de outra; só o login volta para o id existente.
+    """
+    usuario = user_id(nome)
+    if not usuario:
+        if novo:
+            st.error("Nome de usuário inválido: use letras ou números.")
+        return None
+    if usuario in load_users():
+        if novo:
+            st.error(f"Já existe um usuário com o identificador {usuario}; escolha outro nome.")
+            return None
+        return usuario
+    
+    registro = {
+        "nome": str(nome).strip(),
+        "prefixo": f"{USERS_DIR}/{usuario}",
+        "criado": datetime.now().strftime(DATE_FORMAT),
+        "layout": STORAGE_MODE,
+        "formatos": FILE_FORMATS
     }
     
-    response = requests.get(url, headers=headers)
+    def merge(remoto):
+        # Une os usuários: quem outro dispositivo cadastrou continua listado
+        unido = {"usuarios": {**(remoto or {}).get("usuarios", {}), usuario: registro}}
+        return json.dumps(unido, ensure_ascii=False, indent=2), unido
+    
+    status, manifest = _read_github_file(USERS_MANIFEST, json.loads)
+    conteudo, novo = merge(manifest if status == 200 else None)
+    change = _change(conteudo, novo, merge=merge, parser=json.loads)
+    if not _commit_changes({USERS_MANIFEST: change}, f"Novo usuário {usuario} via app"):
+        return None
+    return usuario
+
+def is_partitioned(file_key):
+    """Indica se a tabela usa o layout particionado por mês"""
+    return STORAGE_MODE == "particionado" and file_key in PARTITIONED_DIRS
+
+def _manifest_path(file_key):
+    return user_path(f"{PARTITIONED_DIRS[file_key]}/manifest.json")
+
+def _partition_path(file_key, mes):
+    return user_path(_with_format(f"{PARTITIONED_DIRS[file_key]}/{mes}.csv", file_key))
+
+def _table_path(file_key):
+    return user_path(_with_format(DATA_FILES[file_key], file_key))
+
+def _legacy_path(path):
+    """CSV equivalente de um arquivo Parquet (formato anterior à migração)"""
+    return path[:-len(".parquet")] + ".csv" if path.endswith(".parquet") else None
+
+def _read_table(path, file_key):
+    """Lê um arquivo de tabela; em Parquet ainda inexistente usa o CSV antigo, que a próxima gravação migra"""
+    status, data = _read_github_file(path, _table_parser(path, file_key))
+    if status == 404 and _legacy_path(path):
+        status, data = _read_github_file(_legacy_path(path), _csv_parser(file_key))
+    return status, data
+
+def _drop_legacy(changes, path):
+    """Remove no mesmo commit o CSV antigo de um arquivo migrado para Parquet, se ele foi lido"""
+    legado = _legacy_path(path)
+    if legado and cached_sha(legado):
+        changes[legado] = _change(None, None)
+    return changes
+
+def _partition_months(df):
+    """Mês (AAAA-MM) de cada linha, usado como chave de partição"""
+    return df["Data"].dt.strftime("%Y-%m")
+
+def load_manifest(file_key):
+    """Lê o manifesto de partições ({"particoes": [meses]}); None em caso de erro"""
+    status, manifest = _read_github_file(_manifest_path(file_key), json.loads)
+    if status == 200:
+        return manifest
+    elif status == 404:
+        return {"particoes": []}
+    st.error(f"Erro ao carregar manifesto do GitHub: {status}")
+    return None
+
+def _manifest_change(meses):
+    def merge(remoto):
+        # Une os meses: partições criadas por outro dispositivo continuam listadas
+        unido = {"particoes": sorted(set(meses) | set((remoto or {}).get("particoes", [])))}
+        return json.dumps(unido, indent=2), unido
+    
+    manifest = {"particoes": sorted(meses)}
+    return _change(json.dumps(manifest, indent=2), manifest, merge=merge, parser=json.loads)
+
+def _load_partitions(file_key, desde=None, ate=None, colunas=None):
+    """Concatena as partições listadas no manifesto, só dos meses entre `desde` e `ate` se informados"""
+    manifest = load_manifest(file_key)
+    if manifest is None:
+        return _empty_frame(file_key, colunas)
+    
+    meses = manifest["particoes"]
+    if not meses:
+        # Ainda sem partições: a tabela está no arquivo único, migrado na primeira gravação
+        status, legado = _read_table(_table_path(file_key), file_key)
+        if status == 200:
+            return read_frame(legado, file_key, colunas, desde, ate)
+        elif status != 404:
+            st.error(f"Erro ao carregar dados do GitHub: {status}")
+        return _empty_frame(file_key, colunas)
+    
+    if desde is not None:
+        mes_inicial = pd.Timestamp(desde).strftime("%Y-%m")
+        meses = [mes for mes in meses if mes >= mes_inicial]
+    if ate is not None:
+        mes_final = pd.Timestamp(ate).strftime("%Y-%m")
+        meses = [mes for mes in meses if mes <= mes_final]
+    
+    frames = []
+    for mes in meses:
+        status, data = _read_table(_partition_path(file_key, mes), file_key)
+        if status == 200:
+            frames.append(read_frame(data, file_key, colunas, desde, ate))
+        elif status != 404:
+            st.error(f"Erro ao carregar dados do GitHub: {status}")
+            return _empty_frame(file_key, colunas)
+    
+    if not frames:
+        return _empty_frame(file_key, colunas)
+    return pd.concat(frames, ignore_index=True)
+
+def _drop_single_file(changes, file_key):
+    """Remove no mesmo commit o arquivo único da tabela (e o CSV antigo dele), já migrado para partições"""
+    path = _table_path(file_key)
+    if cached_sha(path):
+        changes[path] = _change(None, None)
+    return _drop_legacy(changes, path)
+
+def _plan_partition_save(df, file_key):
+    """Alterações para regravar a tabela inteira como partições mensais, pulando as que não mudaram"""
+    manifest = load_manifest(file_key)
+    if manifest is None:
+        return None
+    
+    changes = {}
+    meses_novos = set()
+    for mes, df_mes in df.groupby(_partition_months(df), sort=True):
+        meses_novos.add(mes)
+        path = _partition_path(file_key, mes)
+        status, atual = _read_table(path, file_key)
+        # Só conta como inalterada se veio do próprio arquivo (não do CSV antigo)
+        if status == 200 and cached_sha(path) and \
+                to_csv_text(read_frame(atual, file_key), file_key) == to_csv_text(df_mes, file_key):
+            continue
+        changes[path] = _table_change(df_mes, file_key, path)
+        _drop_legacy(changes, path)
+    
+    for mes in set(manifest["particoes"]) - meses_novos:
+        path = _partition_path(file_key, mes)
+        changes[path] = _change(None, None)
+        _drop_legacy(changes, path)
+    
+    if meses_novos != set(manifest["particoes"]):
+        changes[_manifest_path(file_key)] = _manifest_change(meses_novos)
+    return changes
+
+def _plan_partition_append(df_novo, file_key, upsert=False):
+    """Alterações para acrescentar linhas só às partições dos meses afetados (com `upsert`, substituindo pela chave)"""
+    manifest = load_manifest(file_key)
+    if manifest is None:
+        return None
+    
+    if not manifest["particoes"]:
+        status, legado = _read_table(_table_path(file_key), file_key)
+        if status == 200:
+            # Primeira gravação particionada: o arquivo único vira partições no mesmo commit
+            antigo = read_frame(legado, file_key)
+            df_total = _merge_rows(antigo, df_novo, file_key) if upsert else pd.concat([antigo, df_novo], ignore_index=True)
+            changes = _plan_partition_save(coerce_schema(df_total, file_key), file_key)
+            return _drop_single_file(changes, file_key) if changes is not None else None
+        elif status != 404:
+            st.error(f"Erro ao carregar dados do GitHub: {status}")
+            return None
+    
+    changes = {}
+    meses = set(manifest["particoes"])
+    for mes, df_mes in df_novo.groupby(_partition_months(df_novo), sort=True):
+        path = _partition_path(file_key, mes)
+        status, atual = _read_table(path, file_key)
+        if status == 200:
+            antigo = read_frame(atual, file_key)
+            df_mes = _merge_rows(antigo, df_mes, file_key) if upsert else pd.concat([antigo, df_mes], ignore_index=True)
+        elif status != 404:
+            st.error(f"Erro ao carregar dados do GitHub: {status}")
+            return None
+        changes[path] = _table_change(df_mes, file_key, path)
+        _drop_legacy(changes, path)
+        meses.add(mes)
     
-    if response.status_code == 200:
-        content = response.json()["content"]
-        decoded_content = base64.b64decode(content).decode("utf-8")
-        return pd.read_csv(StringIO(decoded_content))
-    elif response.status_code == 404:
+    if meses != set(manifest["particoes"]):
+        changes[_manifest_path(file_key)] = _manifest_change(meses)
+    return changes
+
+def _plan_save(df, file_key):
+    if is_partitioned(file_key):
+        return _plan_partition_save(df, file_key)
+    path = _table_path(file_key)
+    return _drop_legacy({path: _table_change(df, file_key, path)}, path)
+
+def _plan_append(df_novo, file_key, upsert=False):
+    if is_partitioned(file_key):
+        return _plan_partition_append(df_novo, file_key, upsert=upsert)
+    df_antigo = load_data_from_github(file_key)
+    if upsert:
+        df_total = _merge_rows(df_antigo, df_novo, file_key)
+    else:
+        df_total = pd.concat([df_antigo, df_novo], ignore_index=True)
+    path = _table_path(file_key)
+    return _drop_legacy({path: _table_change(df_total, file_key, path)}, path)
+
+def compact_partitions(file_key):
+    """Migra o arquivo único legado para partições e regrava as partições sem linhas duplicadas"""
+    status, legado = _read_table(_table_path(file_key), file_key)
+    if status not in (200, 404):
+        st.error(f"Erro ao carregar dados do GitHub: {status}")
+        return False
+    
+    df_total = _load_partitions(file_key)
+    if legado is not None:
+        df_total = pd.concat([read_frame(legado, file_key), df_total], ignore_index=True)
+    
+    df_total, _ = dedupe_rows(df_total, file_key)
+    changes = _plan_partition_save(coerce_schema(df_total, file_key), file_key)
+    if changes is None:
+        return False
+    if legado is not None:
+        # O arquivo único já está nas partições: sai no mesmo commit, para não ser relido nem servir dados velhos
+        _drop_single_file(changes, file_key)
+    return _commit_changes(changes, f"Compactação de {file_key} via app")
+
+def load_data_from_github(file_key, desde=None, ate=None, colunas=None):
+    """Carrega dados do GitHub (com cache por ETag) ou retorna DataFrame vazio; `colunas` limita o que é lido"""
+    if is_partitioned(file_key):
+        return _load_partitions(file_key, desde=desde, ate=ate, colunas=colunas)
+    
+    path = _table_path(file_key)
+    status, data = _read_table(path, file_key)
+    
+    if status == 200:
+        return read_frame(data, file_key, colunas, desde, ate)
+    elif status == 404:
         # Arquivo não existe, retorna DataFrame vazio
-        if file_key == "treinos":
-            return pd.DataFrame(columns=["Data", "Dia", "Grupo Muscular", "Exercício", "Carga (kg)", "Repetições", "Séries", "Observações"])
-        elif file_key == "progresso":
-            return pd.DataFrame(columns=["Data", "Peso (kg)", "Horas de Sono", "Cansaço", "Humor", "Calorias", "Água (copos)"])
-        elif file_key == "metas":
-            return pd.DataFrame(columns=["Meta", "Valor", "Atual"])
+        return _empty_frame(file_key, colunas)
     else:
-        st.error(f"Erro ao carregar dados do GitHub: {response.status_code}")
-        return pd.DataFrame()
+        st.error(f"Erro ao carregar dados do GitHub: {status}")
+        return _empty_frame(file_key, colunas)
+
+def _summary_merger(saves, appends, upserts):
+    """Merge do índice num conflito: recalcula sobre os treinos remotos com os nossos, em vez de mesclar por chave.
+    
+    O índice remoto é coerente com os treinos remotos (são gravados juntos); as nossas linhas
+    entram por cima dele com upsert_summary, e só sem isso o índice é reconstruído.
+    """
+    def merge(remoto):
+        resumo = read_frame(remoto, "resumo") if remoto is not None else _empty_frame("resumo")
+        linhas = upserts.get("treinos", appends.get("treinos"))
+        with revalidated():
+            if "treinos" in saves:
+                df = build_summary(_merge_rows(load_data_from_github("treinos"), saves["treinos"], "treinos"))
+            elif linhas is None:
+                df = build_summary(load_data_from_github("treinos"))
+            else:
+                sufixo = load_data_from_github("treinos", desde=linhas["Data"].min())
+                df = upsert_summary(resumo, sufixo, linhas)
+                if df is None:
+                    df = build_summary(_merge_rows(load_data_from_github("treinos"), linhas, "treinos"))
+        content = _serialize(df, "resumo", _table_path("resumo"))
+        return content, (content if isinstance(content, bytes) else df)
+    return merge
+
+def write_many_to_github(saves=None, appends=None, upserts=None):
+    """Substitui tabelas, acrescenta linhas e faz upsert por chave ({file_key: df} cada) num único commit atômico"""
+    saves = {file_key: coerce_schema(df, file_key) for file_key, df in (saves or {}).items()}
+    appends = {file_key: coerce_schema(df, file_key) for file_key, df in (appends or {}).items()}
+    upserts = {file_key: coerce_schema(df, file_key) for file_key, df in (upserts or {}).items()}
+    changes = {}
+    for file_key, df in saves.items():
+        plano = _plan_save(df, file_key)
+        if plano is None:
+            return False
+        changes.update(plano)
+    for file_key, df_novo in appends.items():
+        plano = _plan_append(df_novo, file_key)
+        if plano is None:
+            return False
+        changes.update(plano)
+    for file_key, df_novo in upserts.items():
+        plano = _plan_append(df_novo, file_key, upsert=True)
+        if plano is None:
+            return False
+        changes.update(plano)
+    if "resumo" in saves:
+        # Índice derivado de treinos: num conflito é recalculado, nunca mesclado linha a linha
+        changes[_table_path("resumo")]["merge"] = _summary_merger(saves, appends, upserts)
+    tabelas = list(dict.fromkeys([*saves, *appends, *upserts]))
+    return _commit_changes(changes, f"Atualização de {', '.join(tabelas)} via app")
+
+def save_many_to_github(dfs):
+    """Substitui várias tabelas ({file_key: df}) num único commit atômico"""
+    return write_many_to_github(saves=dfs)
+
+# 🗄️ Backends de armazenamento (selecionados por configuração)
+STORAGE_BACKEND = os.environ.get("GYM_STORAGE_BACKEND", "github")  # "github" ou "sqlite"
+SQLITE_PATH = os.environ.get("GYM_SQLITE_PATH", "data/gym.db")
+SQLITE_SYNC_INTERVAL = float(os.environ.get("GYM_SQLITE_SYNC_INTERVAL", "3600"))  # Segundos entre backups no GitHub (0 desliga)
+
+SQLITE_AFFINITY = {"date": "TEXT", "category": "TEXT", "string": "TEXT", "Int16": "INTEGER", "Int32": "INTEGER"}
+SQLITE_TYPES = {
+    file_key: {coluna: SQLITE_AFFINITY.get(tipo, "REAL") for coluna, tipo in schema.items()}
+    for file_key, schema in SCHEMAS.items()
+}
+SQLITE_INDEXES = {
+    "idx_treinos_exercicio_data": ("treinos", ["Exercício", "Data"]),
+    "idx_treinos_data": ("treinos", ["Data"]),
+    "idx_progresso_data": ("progresso", ["Data"])
+}
+
+def _as_date_str(value):
+    """Normaliza datas de filtro para o formato AAAA-MM-DD usado nos arquivos"""
+    return pd.Timestamp(value).strftime("%Y-%m-%d")
 
-def save_data_to_github(df, file_key):
-    """Salva DataFrame no arquivo CSV no GitHub"""
-    path = DATA_FILES[file_key]
-    content = df.to_csv(index=False)
-    encoded_content = base64.b64encode(content.encode("utf-8")).decode("utf-8")
+def _apply_filters(df, exercicio=None, desde=None, ate=None):
+    """Aplica em memória os filtros que o backend SQLite resolve com índices"""
+    if df.empty:
+        return df
+    mascara = pd.Series(True, index=df.index)
+    if exercicio is not None:
+        mascara &= df["Exercício"] == exercicio
+    if desde is not None:
+        mascara &= df["Data"] >= pd.Timestamp(desde).normalize()
+    if ate is not None:
+        mascara &= df["Data"] <= pd.Timestamp(ate).normalize()
+    return df[mascara].reset_index(drop=True)
+
+class GitHubCSVBackend:
+    """Backend padrão: um arquivo CSV ou Parquet (ou partições) por tabela no repositório GitHub"""
+    name = "github"
     
-    sha = get_file_sha(path)
+    def load(self, file_key, exercicio=None, desde=None, ate=None, colunas=None):
+        leitura = colunas
+        if colunas is not None and exercicio is not None and "Exercício" not in colunas:
+            leitura = [*colunas, "Exercício"]
+        df = load_data_from_github(file_key, desde=desde, ate=ate, colunas=leitura)
+        df = _apply_filters(df, exercicio=exercicio)
+        return df if colunas is None else df[colunas]
     
-    url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/{path}"
-    headers = {
-        "Authorization": f"token {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json"
+    def value_counts(self, file_key, coluna):
+        df = load_data_from_github(file_key, colunas=[coluna])
+        if df.empty:
+            return pd.DataFrame(columns=[coluna, "Contagem"])
+        return df.groupby(coluna, observed=True).size().reset_index(name="Contagem")
+    
+    def write_many(self, saves, appends, upserts=None):
+        return write_many_to_github(saves=saves, appends=appends, upserts=upserts)
+    
+    def version(self, file_key):
+        """SHAs dos arquivos da tabela vistos na última leitura (mudam a cada gravação)"""
+        if not is_partitioned(file_key):
+            return str(cached_sha(_table_path(file_key)))
+        manifest = _cache_get(_manifest_path(file_key))
+        meses = manifest["data"]["particoes"] if manifest is not None else []
+        return ",".join(str(cached_sha(p)) for p in [_manifest_path(file_key), *(_partition_path(file_key, m) for m in meses)])
+    
+    def maybe_sync(self):
+        pass
+
+class SQLiteBackend:
+    """Backend local em SQLite (modo WAL) com índices por exercício e data; faz backup periódico no GitHub"""
+    name = "sqlite"
+    
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        novo = not os.path.exists(path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        for file_key, tipos in SQLITE_TYPES.items():
+            colunas = ", ".join(f'"{col}" {tipo}' for col, tipo in tipos.items())
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {file_key} ({colunas})")
+        for nome, (file_key, indice) in SQLITE_INDEXES.items():
+            cols = ", ".join(f'"{col}"' for col in indice)
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS {nome} ON {file_key} ({cols})")
+        self.conn.commit()
+        self.last_sync = time.monotonic()
+        self.dirty = False
+        if novo:
+            self._seed_from_github()
+    
+    def _seed_from_github(self):
+        """Na primeira execução importa o histórico existente do GitHub"""
+        for file_key in SQLITE_TYPES:
+            df = load_data_from_github(file_key)
+            if not df.empty:
+                self._insert(df, file_key)
+        self.conn.commit()
+    
+    def _insert(self, df, file_key):
+        colunas = COLUNAS[file_key]
+        placeholders = ", ".join("?" for _ in colunas)
+        nomes = ", ".join(f'"{col}"' for col in colunas)
+        self.conn.executemany(f"INSERT INTO {file_key} ({nomes}) VALUES ({placeholders})",
+                              [tuple(r.values()) for r in to_records(df, file_key)])
+    
+    def load(self, file_key, exercicio=None, desde=None, ate=None, colunas=None):
+        condicoes, params = [], []
+        if exercicio is not None:
+            condicoes.append('"Exercício" = ?')
+            params.append(exercicio)
+        if desde is not None:
+            condicoes.append('"Data" >= ?')
+            params.append(_as_date_str(desde))
+        if ate is not None:
+            condicoes.append('"Data" <= ?')
+            params.append(_as_date_str(ate))
+        selecao = ", ".join(f'"{col}"' for col in colunas) if colunas else "*"
+        sql = f"SELECT {selecao} FROM {file_key}"
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        # Upserts e importações reinserem linhas: a ordem é a das datas, não a da inserção
+        sql += ' ORDER BY "Data", rowid' if "Data" in SQLITE_TYPES[file_key] else " ORDER BY rowid"
+        with self.lock:
+            df = pd.read_sql_query(sql, self.conn, params=params)
+        return coerce_schema(df, file_key, colunas)
+    
+    def value_counts(self, file_key, coluna):
+        sql = f'SELECT "{coluna}", COUNT(*) AS "Contagem" FROM {file_key} GROUP BY "{coluna}" ORDER BY "{coluna}"'
+        with self.lock:
+            return pd.read_sql_query(sql, self.conn)
+    
+    def _delete_keys(self, df, file_key):
+        chave = ROW_KEYS[file_key]
+        condicao = " AND ".join(f'"{col}" = ?' for col in chave)
+        self.conn.executemany(f"DELETE FROM {file_key} WHERE {condicao}",
+                              [tuple(r[col] for col in chave) for r in to_records(df, file_key)])
+    
+    def write_many(self, saves, appends, upserts=None):
+        with self.lock, self.conn:
+            for file_key, df in saves.items():
+                self.conn.execute(f"DELETE FROM {file_key}")
+                self._insert(df, file_key)
+            for file_key, df_novo in appends.items():
+                self._insert(df_novo, file_key)
+            for file_key, df_novo in (upserts or {}).items():
+                self._delete_keys(df_novo, file_key)
+                self._insert(df_novo, file_key)
+        self.dirty = True
+        return True
+    
+    def version(self, file_key):
+        # total_changes só cresce nesta conexão, que é única no processo
+        return str(self.conn.total_changes)
+    
+    def export_to_github(self):
+        """Copia todas as tabelas para os CSVs do GitHub (backup)"""
+        ok = save_many_to_github({file_key: self.load(file_key) for file_key in SQLITE_TYPES})
+        if ok:
+            self.dirty = False
+            self.last_sync = time.monotonic()
+        return ok
+    
+    def maybe_sync(self):
+        """Exporta para o GitHub se houve gravações e o intervalo configurado passou"""
+        if SQLITE_SYNC_INTERVAL > 0 and self.dirty and time.monotonic() - self.last_sync >= SQLITE_SYNC_INTERVAL:
+            try:
+                self.export_to_github()
+            except requests.RequestException:
+                # Sem conexão: os dados seguem no SQLite e o backup espera o próximo intervalo
+                self.last_sync = time.monotonic()
+
+def sqlite_path(usuario=None):
+    """Banco SQLite do usuário (um arquivo por usuário, ao lado do banco padrão)"""
+    usuario = usuario or current_user()
+    if usuario == DEFAULT_USER:
+        return SQLITE_PATH
+    return os.path.join(os.path.dirname(SQLITE_PATH), "usuarios", f"{usuario}.db")
+
+@st.cache_resource
+def backend_for(usuario):
+    """Backend de armazenamento de um usuário, escolhido por GYM_STORAGE_BACKEND"""
+    if STORAGE_BACKEND == "sqlite":
+        with user_scope(usuario):
+            return SQLiteBackend(sqlite_path(usuario))
+    return GitHubCSVBackend()
+
+def get_backend():
+    """Backend do usuário atual"""
+    return backend_for(current_user())
+
+@instrumented("carregar")
+def load_data(file_key, exercicio=None, desde=None, ate=None, colunas=None):
+    """Carrega uma tabela pelo backend configurado, com filtros opcionais por exercício e datas.
+    
+    `colunas` limita as colunas lidas (em Parquet e SQLite as outras nem são decodificadas).
+    
+    Gravações ainda na fila do escritor em segundo plano são aplicadas por cima, para que
+    quem acabou de salvar já veja os próprios dados.
+    """
+    df = get_backend().load(file_key, exercicio=exercicio, desde=desde, ate=ate, colunas=colunas)
+    if WRITE_BEHIND:
+        for op, df_op in get_writer().pending_ops(file_key):
+            df_op = _apply_filters(df_op, exercicio=exercicio, desde=desde, ate=ate)
+            df_op = df_op if colunas is None else df_op[colunas]
+            if op == "save":
+                df = df_op
+            elif op == "upsert" and set(ROW_KEYS[file_key]) <= set(df.columns):
+                df = _merge_rows(df, df_op, file_key)
+            else:
+                df = pd.concat([df, df_op], ignore_index=True)
+        # concat de categorias diferentes vira object; volta ao esquema
+        df = coerce_schema(df, file_key, colunas)
+    return df
+
+def save_data(df, file_key):
+    """Substitui o conteúdo de uma tabela pelo backend configurado"""
+    return write_tables(saves={file_key: df})
+
+@instrumented("carregar_varios")
+def load_many(file_keys):
+    """Carrega várias tabelas em paralelo; a latência passa a ser a da mais lenta"""
+    ctx = get_script_run_ctx()
+    
+    def carregar(file_key):
+        # Permite st.error dentro da thread, associando-a à execução atual do script
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return load_data(file_key)
+    
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as pool:
+        return dict(zip(file_keys, pool.map(carregar, file_keys)))
+
+def upsert_data(df, file_key):
+    """Grava linhas substituindo as que têm a mesma chave (ROW_KEYS) e acrescentando as novas"""
+    return write_tables(upserts={file_key: df})
+
+# 📇 Índice agregado por exercício (mantido a cada gravação de treinos)
+RECENT_WINDOW = 3  # Treinos usados na "Média Recente"
+SUMMARY_TOTAL = "__total__"  # Linha com os totais globais (dias de treino, volume)
+
+def _prepare_sets(df_treinos):
+    """Colunas numéricas usadas pelo índice, com volume (carga×reps×séries) e 1RM de Epley por linha"""
+    df = coerce_schema(df_treinos, "treinos").sort_values("Data", kind="stable")
+    # Contas em float64/int64 para não acumular erro do float32 em volumes grandes
+    carga = df["Carga (kg)"].astype("float64").fillna(0.0)
+    reps = df["Repetições"].fillna(0).astype("int64")
+    series = df["Séries"].fillna(0).astype("int64")
+    return df.assign(_carga=carga, _volume=carga * reps * series, _1rm=(carga * (1 + reps / 30)).round(2))
+
+def _summary_total(df):
+    return {
+        "Exercício": SUMMARY_TOTAL,
+        "Volume Total (kg)": df["_volume"].sum(),
+        "Sessões": df["Data"].nunique(),
+        "Data Inicial": df["Data"].min(),
+        "Data Final": df["Data"].max()
     }
+
+@instrumented("indice_reconstruir")
+def build_summary(df_treinos):
+    """Calcula o índice do zero a partir do histórico completo de treinos"""
+    if df_treinos.empty:
+        return _empty_frame("resumo")
+    df = _prepare_sets(df_treinos)
+    g = df.groupby("Exercício", sort=True, observed=True)
+    recentes = g.tail(RECENT_WINDOW).groupby("Exercício", sort=True, observed=True)["_carga"]
+    resumo = pd.DataFrame({
+        "Carga Máx (kg)": g["_carga"].max(),
+        "Carga Inicial (kg)": g["_carga"].first(),
+        "Carga Final (kg)": g["_carga"].last(),
+        "Média Recente (kg)": recentes.mean(),
+        "Últimas Cargas": recentes.agg(lambda s: ";".join(s.astype(str))),
+        "Volume Total (kg)": g["_volume"].sum(),
+        "1RM Estimado (kg)": g["_1rm"].max(),
+        "Sessões": g["Data"].nunique(),
+        "Data Inicial": g["Data"].min(),
+        "Data Final": g["Data"].max()
+    }).reset_index()
+    resumo["Exercício"] = resumo["Exercício"].astype("string")
+    total = pd.DataFrame([_summary_total(df)])
+    return coerce_schema(pd.concat([resumo, total], ignore_index=True), "resumo")
+
+def update_summary(resumo, df_novo):
+    """Atualiza o índice só com as linhas novas; None quando é preciso reconstruir (índice vazio ou datas retroativas)"""
+    if resumo.empty or SUMMARY_TOTAL not in resumo["Exercício"].values:
+        return None
+    if df_novo.empty:
+        return resumo
+    
+    antigo = resumo.set_index("Exercício")
+    total = antigo.loc[SUMMARY_TOTAL]
+    novo = _prepare_sets(df_novo)
+    if (novo["Data"] < total["Data Final"]).any():
+        return None
+    
+    parcial = build_summary(df_novo).set_index("Exercício")
+    antigo, parcial = antigo.drop(SUMMARY_TOTAL), parcial.drop(SUMMARY_TOTAL)
+    indice = antigo.index.union(parcial.index)
+    a, p = antigo.reindex(indice), parcial.reindex(indice)
+    tem_antigo, tem_novo = a["Sessões"].notna(), p["Sessões"].notna()
+    # Um treino no mesmo dia da última sessão não conta como sessão nova
+    repetida = (p["Data Inicial"] == a["Data Final"]).astype(int)
+    
+    ultimas = (a["Últimas Cargas"].fillna("").astype(str) + ";" + p["Últimas Cargas"].fillna("").astype(str))
+    ultimas = ultimas.str.strip(";").str.split(";").str[-RECENT_WINDOW:].str.join(";")
     
-    data = {
-        "message": f"Atualização de {file_key} via app",
-        "content": encoded_content,
-        "branch": GITHUB_BRANCH
+    atualizado = pd.DataFrame({
+        "Carga Máx (kg)": pd.concat([a["Carga Máx (kg)"], p["Carga Máx (kg)"]], axis=1).max(axis=1),
+        "Carga Inicial (kg)": a["Carga Inicial (kg)"].where(tem_antigo, p["Carga Inicial (kg)"]),
+        "Carga Final (kg)": p["Carga Final (kg)"].where(tem_novo, a["Carga Final (kg)"]),
+        "Média Recente (kg)": ultimas.str.split(";", expand=True).astype(float).mean(axis=1),
+        "Últimas Cargas": ultimas,
+        "Volume Total (kg)": a["Volume Total (kg)"].fillna(0) + p["Volume Total (kg)"].fillna(0),
+        "1RM Estimado (kg)": pd.concat([a["1RM Estimado (kg)"], p["1RM Estimado (kg)"]], axis=1).max(axis=1),
+        "Sessões": (a["Sessões"].fillna(0) + p["Sessões"].fillna(0) - repetida).astype(int),
+        "Data Inicial": a["Data Inicial"].where(tem_antigo, p["Data Inicial"]),
+        "Data Final": p["Data Final"].where(tem_novo, a["Data Final"])
+    }, index=indice).rename_axis("Exercício").reset_index()
+    
+    total_novo = _summary_total(novo)
+    total_novo["Sessões"] += int(total["Sessões"]) - int(total_novo["Data Inicial"] == total["Data Final"])
+    total_novo["Volume Total (kg)"] += float(total["Volume Total (kg)"])
+    total_novo["Data Inicial"] = total["Data Inicial"]
+    return coerce_schema(pd.concat([atualizado, pd.DataFrame([total_novo])], ignore_index=True), "resumo")
+
+def rebase_summary(resumo, sufixo_antigo, sufixo_novo, desde):
+    """Atualiza o índice trocando as linhas de `desde` em diante (sufixo_antigo -> sufixo_novo) sem ler o resto do histórico.
+    
+    Tira do índice a parte do sufixo antigo (volume, sessões, últimas cargas) e soma a do novo
+    com update_summary. None quando o máximo depende do histórico: a linha trocada tinha a
+    carga máxima (ou o 1RM) do exercício e o valor novo é menor.
+    """
+    if resumo.empty or SUMMARY_TOTAL not in resumo["Exercício"].values:
+        return None
+    if sufixo_antigo.empty:
+        return update_summary(resumo, sufixo_novo)
+    desde = pd.Timestamp(desde).normalize()
+    antigo = resumo.set_index("Exercício")
+    total = antigo.loc[SUMMARY_TOTAL]
+    if total["Data Inicial"] >= desde:
+        # Nada antes de `desde`: o sufixo novo é o histórico inteiro
+        return build_summary(sufixo_novo)
+    
+    a = antigo.drop(SUMMARY_TOTAL)
+    velho = build_summary(sufixo_antigo).set_index("Exercício")
+    s = velho.drop(SUMMARY_TOTAL).reindex(a.index)
+    n = build_summary(sufixo_novo).set_index("Exercício").drop(SUMMARY_TOTAL).reindex(a.index)
+    no_sufixo = s["Sessões"].notna()
+    
+    maximos = {}
+    for coluna in ["Carga Máx (kg)", "1RM Estimado (kg)"]:
+        incerto = no_sufixo & (s[coluna] >= a[coluna])
+        if (incerto & ~(n[coluna] >= a[coluna])).any():
+            return None
+        # O máximo de antes de `desde` fica em aberto: o do sufixo novo já é maior ou igual
+        maximos[coluna] = a[coluna].mask(incerto)
+    
+    linhas = sufixo_antigo.groupby("Exercício", observed=True).size().reindex(a.index, fill_value=0)
+    cargas = a["Últimas Cargas"].fillna("").astype(str).str.split(";")
+    vespera = desde - pd.Timedelta(days=1)  # Só para update_summary, que a troca pela data do sufixo
+    antes = pd.DataFrame({
+        **maximos,
+        "Carga Inicial (kg)": a["Carga Inicial (kg)"],
+        "Carga Final (kg)": a["Carga Final (kg)"],
+        "Média Recente (kg)": a["Média Recente (kg)"],
+        "Últimas Cargas": [";".join(lista[:max(len(lista) - k, 0)]) for lista, k in zip(cargas, linhas)],
+        "Volume Total (kg)": a["Volume Total (kg)"] - s["Volume Total (kg)"].fillna(0),
+        "Sessões": a["Sessões"] - s["Sessões"].fillna(0),
+        "Data Inicial": a["Data Inicial"],
+        "Data Final": a["Data Final"].mask(no_sufixo, vespera)
+    }, index=a.index)[a["Data Inicial"] < desde].rename_axis("Exercício").reset_index()
+    
+    total_antes = {
+        "Exercício": SUMMARY_TOTAL,
+        "Volume Total (kg)": total["Volume Total (kg)"] - velho.loc[SUMMARY_TOTAL, "Volume Total (kg)"],
+        "Sessões": total["Sessões"] - velho.loc[SUMMARY_TOTAL, "Sessões"],
+        "Data Inicial": total["Data Inicial"],
+        "Data Final": vespera
     }
+    antes = coerce_schema(pd.concat([antes, pd.DataFrame([total_antes])], ignore_index=True), "resumo")
+    return update_summary(antes, sufixo_novo)
+
+def upsert_summary(resumo, sufixo, df_novo):
+    """Índice depois de um upsert de treinos; `sufixo` são as linhas salvas a partir da data mais antiga de `df_novo`.
+    
+    No caso comum (linhas novas, sem datas retroativas) é só update_summary; trocas e datas
+    retroativas refazem apenas o trecho desde essa data. None quando é preciso reconstruir.
+    """
+    existe = not sufixo.empty and compare_rows(df_novo, sufixo, "treinos")[0].any()
+    atualizado = None if existe else update_summary(resumo, df_novo)
+    if atualizado is None:
+        atualizado = rebase_summary(resumo, sufixo, _merge_rows(sufixo, df_novo, "treinos"), df_novo["Data"].min())
+    return atualizado
+
+@instrumented("gravar")
+def write_tables(saves=None, appends=None, upserts=None, backend=None):
+    """Ponto único de gravação: leva junto, na mesma operação, o índice atualizado quando treinos muda.
+    
+    `upserts` substitui as linhas com a mesma chave (ROW_KEYS) e acrescenta as demais.
+    """
+    saves = {file_key: coerce_schema(df, file_key) for file_key, df in (saves or {}).items()}
+    appends = {file_key: coerce_schema(df, file_key) for file_key, df in (appends or {}).items()}
+    upserts = {file_key: coerce_schema(df, file_key) for file_key, df in (upserts or {}).items()}
+    backend = backend or get_backend()
+    if "treinos" in saves:
+        df_treinos = saves["treinos"]
+        if "treinos" in appends:
+            df_treinos = pd.concat([df_treinos, appends["treinos"]], ignore_index=True)
+        if "treinos" in upserts:
+            df_treinos = _merge_rows(df_treinos, upserts["treinos"], "treinos")
+        saves["resumo"] = build_summary(df_treinos)
+    elif "treinos" in upserts:
+        df_novo = upserts["treinos"]
+        if "treinos" in appends:
+            df_novo = _merge_rows(appends["treinos"], df_novo, "treinos")
+        # Só as linhas a partir da data mais antiga do upsert (no particionado, só esses meses)
+        sufixo = backend.load("treinos", desde=df_novo["Data"].min())
+        resumo = upsert_summary(backend.load("resumo"), sufixo, df_novo)
+        if resumo is None:
+            resumo = build_summary(_merge_rows(backend.load("treinos"), df_novo, "treinos"))
+        saves["resumo"] = resumo
+    elif "treinos" in appends:
+        resumo = update_summary(backend.load("resumo"), appends["treinos"])
+        if resumo is None:
+            resumo = build_summary(pd.concat([backend.load("treinos"), appends["treinos"]], ignore_index=True))
+        saves["resumo"] = resumo
+    return backend.write_many(saves, appends, upserts)
+
+@instrumented("indice")
+def load_summary(resumo=None):
+    """Índice por exercício já com as gravações na fila; reconstrói e salva se ainda não existir"""
+    if resumo is None:
+        resumo = load_data("resumo")
+    if resumo.empty:
+        df_treinos = load_data("treinos")
+        if df_treinos.empty:
+            return resumo
+        resumo = build_summary(df_treinos)
+        queue_save(resumo, "resumo")
+        return resumo
+    if WRITE_BEHIND:
+        ops = get_writer().pending_ops("treinos")
+        if any(op == "save" for op, _ in ops):
+            return build_summary(load_data("treinos"))
+        if ops:
+            # Só o trecho que as gravações pendentes tocam: salvo (backend) -> com a fila (load_data)
+            desde = min(df_op["Data"].min() for _, df_op in ops)
+            atualizado = rebase_summary(resumo, get_backend().load("treinos", desde=desde),
+                                        load_data("treinos", desde=desde), desde)
+            return atualizado if atualizado is not None else build_summary(load_data("treinos"))
+    return resumo
+
+# 📥 Importação de CSV em blocos, mesclada por chave com o que já está salvo
+IMPORT_CHUNK_ROWS = int(os.environ.get("GYM_IMPORT_CHUNK_ROWS", "5000"))  # Linhas lidas do arquivo por vez
+IMPORT_BATCH_ROWS = int(os.environ.get("GYM_IMPORT_BATCH_ROWS", "20000"))  # Linhas novas ou alteradas por gravação
+
+def detect_table(colunas):
+    """Tabela de um CSV externo pelo cabeçalho ("treinos" ou "progresso"), ou None"""
+    if "Exercício" in colunas and "Carga (kg)" in colunas:
+        return "treinos"
+    if "Peso (kg)" in colunas and "Horas de Sono" in colunas:
+        return "progresso"
+    return None
+
+def row_keys(df, file_key):
+    """Chave (ROW_KEYS) de cada linha como índice, para comparar tabelas"""
+    return pd.MultiIndex.from_frame(df[ROW_KEYS[file_key]].astype("string"))
+
+def row_hashes(df, file_key):
+    """Hash do conteúdo de cada linha já no esquema: linhas iguais têm o mesmo hash"""
+    df = coerce_schema(df, file_key)
+    for coluna, tipo in SCHEMAS[file_key].items():
+        if tipo == "string":
+            # No CSV texto vazio e ausente são a mesma coisa
+            df[coluna] = df[coluna].replace("", pd.NA)
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+def compare_rows(df, salvo, file_key):
+    """Para cada linha de `df`: (já existe linha com a mesma chave em `salvo`, e com o mesmo conteúdo)"""
+    chaves_salvas = row_keys(salvo, file_key)
+    unicas = ~chaves_salvas.duplicated(keep="last")
+    posicao = chaves_salvas[unicas].get_indexer(row_keys(df, file_key))
+    existe = posicao >= 0
+    iguais = existe.copy()
+    iguais[existe] = row_hashes(salvo, file_key)[unicas][posicao[existe]] == row_hashes(df, file_key)[existe]
+    return existe, iguais
+
+def dedupe_rows(df, file_key):
+    """Remove linhas com chave repetida (fica a última) e, em treinos, exercícios não feitos; retorna (df, removidas)"""
+    antes = len(df)
+    df = df[~row_keys(df, file_key).duplicated(keep="last")]
+    if file_key == "treinos":
+        df = df[performed_sets(df)]
+    if "Data" in ROW_KEYS[file_key]:
+        df = df.sort_values("Data", kind="stable")
+    return df.reset_index(drop=True), antes - len(df)
+
+def performed_sets(df_treinos):
+    """Linhas de treino preenchidas: com carga, repetições ou observação (as deixadas em 0 não contam)"""
+    observacao = df_treinos["Observações"].fillna("").astype(str).str.strip() != ""
+    return (df_treinos["Carga (kg)"].fillna(0) > 0) | (df_treinos["Repetições"].fillna(0) > 0) | observacao
+
+@instrumented("importar")
+def import_csv(arquivo, file_key, progresso=None):
+    """Importa um CSV em blocos de IMPORT_CHUNK_ROWS linhas sem substituir o histórico.
     
-    if sha:
-        data["sha"] = sha
+    Cada bloco é validado e comparado, pela chave, com as linhas salvas no mesmo período:
+    iguais são puladas, diferentes substituem as salvas e as demais entram como novas.
+    As gravações saem em lotes de até IMPORT_BATCH_ROWS linhas, então reimportar o mesmo
+    arquivo não grava nada. Retorna (contagens, problemas); `progresso(contagens)` é
+    chamado a cada bloco.
+    """
+    contagens, problemas = Counter(), Counter()
+    vistas = set()  # Chaves já lidas do arquivo (numa repetição vale a última linha)
+    no_lote = set()  # Chaves esperando a próxima gravação
+    lote = []
     
-    response = requests.put(url, headers=headers, data=json.dumps(data))
+    def gravar():
+        df_lote = pd.concat(lote, ignore_index=True)
+        df_lote = df_lote[~row_keys(df_lote, file_key).duplicated(keep="last")]
+        lote.clear()
+        no_lote.clear()
+        if not write_tables(upserts={file_key: df_lote}):
+            contagens["falhas"] += 1
+            return False
+        contagens["gravadas"] += len(df_lote)
+        return True
     
-    if response.status_code not in [200, 201]:
-        st.error(f"Erro ao salvar dados no GitHub: {response.status_code}")
-        st.write(response.json())
-        return False
+    for bloco in pd.read_csv(arquivo, chunksize=IMPORT_CHUNK_ROWS):
+        contagens["lidas"] += len(bloco)
+        df, problemas_bloco = check_schema(bloco, file_key)
+        problemas.update(problemas_bloco)
+        if not df.empty:
+            duplicadas = row_keys(df, file_key).duplicated(keep="last")
+            contagens["repetidas"] += int(duplicadas.sum())
+            df = df[~duplicadas].reset_index(drop=True)
+            chaves = row_keys(df, file_key)
+            repetidas = chaves.isin(vistas)  # Já vieram num bloco anterior
+            contagens["repetidas"] += int(repetidas.sum())
+            vistas.update(chaves)
+            
+            salvo = load_data(file_key, desde=df["Data"].min(), ate=df["Data"].max())
+            existe, iguais = compare_rows(df, salvo, file_key)
+            
+            contagens["iguais"] += int((iguais & ~repetidas).sum())
+            contagens["atualizadas"] += int((existe & ~iguais & ~repetidas).sum())
+            contagens["novas"] += int((~existe & ~repetidas).sum())
+            # Uma repetição igual ao salvo ainda precisa ir se outra versão da linha espera no lote
+            enviar = ~iguais | (repetidas & chaves.isin(no_lote))
+            lote.append(df[enviar])
+            no_lote.update(chaves[enviar])
+            if sum(len(parte) for parte in lote) >= IMPORT_BATCH_ROWS and not gravar():
+                break
+        if progresso:
+            progresso(contagens)
+    else:
+        if lote and sum(len(parte) for parte in lote):
+            gravar()
+    return contagens, describe_problems(problemas)
+
+# 🏆 Origem do valor atual de cada meta no índice (exercício, coluna)
+META_FONTES = {
+    "Agachamento": ("Agachamento", "Carga Máx (kg)"),
+    "Supino": ("Supino Plano", "Carga Máx (kg)"),
+    "Dias de Treino": (SUMMARY_TOTAL, "Sessões")
+}
+CALENDAR_PAGE_DAYS = 14  # Dias por página no calendário de treinos
+# Colunas lidas por cada visão (as observações em texto livre ficam de fora)
+COLUNAS_CARGAS = ["Data", "Exercício", "Carga (kg)", "Repetições", "Séries"]
+COLUNAS_CALENDARIO = ["Data", "Dia", "Grupo Muscular", "Exercício", "Carga (kg)", "Repetições", "Séries"]
+
+@instrumented("metas")
+def goal_progress(df_metas, df_progresso, resumo):
+    """Preenche Atual e Progresso (%) das metas com um único merge contra o índice"""
+    fontes = pd.DataFrame(
+        [(meta, exercicio, coluna) for meta, (exercicio, coluna) in META_FONTES.items()],
+        columns=["Meta", "Exercício", "Coluna"]
+    )
+    valores = resumo.melt(id_vars="Exercício", value_vars=sorted(set(fontes["Coluna"])),
+                          var_name="Coluna", value_name="Atual")
+    atuais = fontes.merge(valores, on=["Exercício", "Coluna"], how="inner")[["Meta", "Atual"]]
+    if not df_progresso.empty:
+        atuais = pd.concat([atuais, pd.DataFrame([{"Meta": "Peso", "Atual": df_progresso["Peso (kg)"].iloc[-1]}])],
+                           ignore_index=True)
+    df = as_float64(df_metas.drop(columns="Atual")).merge(atuais, on="Meta", how="left")
+    df["Atual"] = pd.to_numeric(df["Atual"], errors="coerce").astype("float64").round(3)
+    df["Progresso"] = (df["Atual"] / pd.to_numeric(df["Valor"], errors="coerce") * 100).clip(upper=100)
+    return df
+
+@instrumented("calendario")
+def build_calendar(df_treinos):
+    """Agrupa os treinos por dia (uma linha por data), do mais recente para o mais antigo"""
+    df = _prepare_sets(df_treinos)
+    df["_rotulo"] = df["Exercício"].astype(str) + " (" + df["Carga (kg)"].astype(str) + "kg)"
+    calendario = df.groupby("Data", sort=False).agg(
+        Dia=("Dia", "first"),
+        Grupos=("Grupo Muscular", lambda s: ", ".join(dict.fromkeys(s.astype(str)))),
+        Exercícios=("_rotulo", ", ".join),
+        **{"Exercícios Feitos": ("Exercício", "size"), "Volume (kg)": ("_volume", "sum")}
+    ).sort_index(ascending=False).reset_index()
+    calendario["Semana"] = calendario["Data"] - pd.to_timedelta(calendario["Data"].dt.weekday, unit="D")
+    calendario["Dia da Semana"] = calendario["Data"].dt.weekday.map(dias)
+    return calendario
+
+def summary_row(resumo, exercicio):
+    """Linha do índice para um exercício (ou a linha de totais), ou None"""
+    linhas = resumo[resumo["Exercício"] == exercicio]
+    return linhas.iloc[0] if not linhas.empty else None
+
+# 🗃️ Dados de uma execução da página (cada tabela carregada no máximo uma vez, só quando usada)
+class RunData:
+    """Memoriza as leituras feitas durante uma execução do script.
+    
+    Cada combinação de tabela e filtros é carregada no primeiro acesso; recortes de uma tabela
+    já carregada inteira saem da memória. As entradas são chaveadas pela versão da tabela
+    (data_version), então uma gravação feita no meio da execução não devolve dados velhos.
+    """
+    
+    def __init__(self):
+        self.tabelas = {}
+    
+    def _get(self, chave, file_key):
+        entrada = self.tabelas.get(chave)
+        if entrada is not None and entrada[0] == data_version(file_key):
+            return entrada[1]
+        return None
+    
+    def _put(self, chave, file_key, df):
+        # Versão lida depois do load: antes da primeira leitura ainda não há SHA no cache
+        self.tabelas[chave] = (data_version(file_key), df)
+    
+    def load(self, file_key, exercicio=None, desde=None, ate=None, colunas=None):
+        """Como load_data, mas sem repetir a leitura na mesma execução"""
+        chave = (file_key, exercicio, desde, ate, tuple(colunas) if colunas else None)
+        df = self._get(chave, file_key)
+        if df is None:
+            completa = self._get((file_key, None, None, None, None), file_key)
+            if completa is not None:
+                df = _apply_filters(completa, exercicio=exercicio, desde=desde, ate=ate)
+                df = df if colunas is None else df[colunas]
+            else:
+                df = load_data(file_key, exercicio=exercicio, desde=desde, ate=ate, colunas=colunas)
+            self._put(chave, file_key, df)
+        # Cópia rasa: quem recebe pode criar ou trocar colunas sem afetar as outras leituras
+        return df.copy(deep=False)
+    
+    def prefetch(self, file_keys):
+        """Carrega em paralelo as tabelas inteiras que ainda não foram lidas nesta execução"""
+        faltando = [fk for fk in file_keys if self._get((fk, None, None, None, None), fk) is None]
+        if len(faltando) > 1:
+            for file_key, df in load_many(faltando).items():
+                self._put((file_key, None, None, None, None), file_key, df)
+    
+    def summary(self):
+        """Índice por exercício (load_summary) a partir do resumo desta execução"""
+        def versao():
+            # O índice inclui as gravações de treinos ainda na fila
+            return data_version("resumo") + "|" + data_version("treinos")
+        
+        entrada = self.tabelas.get("__indice__")
+        if entrada is None or entrada[0] != versao():
+            resumo = load_summary(self.load("resumo"))
+            entrada = self.tabelas["__indice__"] = (versao(), resumo)
+        return entrada[1].copy(deep=False)
+    
+    def value_counts(self, file_key, coluna):
+        """Contagem por valor da coluna; usa a tabela inteira se ela já foi carregada"""
+        completa = self._get((file_key, None, None, None, None), file_key)
+        if completa is None:
+            return get_backend().value_counts(file_key, coluna)
+        return completa.groupby(coluna, observed=True).size().reset_index(name="Contagem")
+
+# 📈 Camada de gráficos: uma figura por visão, com redução de pontos e cache do JSON
+CHART_POINT_BUDGET = int(os.environ.get("GYM_CHART_POINT_BUDGET", "400"))  # Pontos máximos por série
+
+def data_version(file_key):
+    """Identifica o estado atual da tabela (backend + fila de gravação), para chavear caches"""
+    versao = f"{current_user()}:{get_backend().version(file_key)}"
+    if WRITE_BEHIND:
+        versao += "|" + ",".join(get_writer().pending_ids(file_key))
+    return versao
+
+def downsample(df, colunas, agg, por=None, budget=None):
+    """Reduz séries acima do orçamento de pontos agregando por semana (ou mês, se ainda não couber)"""
+    budget = budget or CHART_POINT_BUDGET
+    maior_serie = df.groupby(por, observed=True).size().max() if por else len(df)
+    if df.empty or maior_serie <= budget:
+        return df
+    df = df.set_index("Data")
+    for freq in ("W-MON", "MS"):
+        agrupado = df.groupby(por, observed=True)[colunas] if por else df[colunas]
+        reduzido = agrupado.resample(freq, label="left", closed="left").agg(agg).dropna(how="all").reset_index()
+        maior_serie = reduzido.groupby(por, observed=True).size().max() if por else len(reduzido)
+        if maior_serie <= budget:
+            break
+    return reduzido
+
+def exercise_history_figure(df_treinos, exercicios, titulo="Progresso"):
+    """Uma figura com uma série por exercício e um menu para alternar entre eles"""
+    df = df_treinos[df_treinos["Exercício"].isin(exercicios)][["Data", "Exercício", "Carga (kg)"]]
+    df = downsample(df, ["Carga (kg)"], "max", por="Exercício").sort_values("Data", kind="stable")
+    series = dict(tuple(df.groupby("Exercício", sort=False, observed=True)))
+    nomes = [ex for ex in exercicios if ex in series]
+    
+    fig = go.Figure()
+    for i, exercicio in enumerate(nomes):
+        fig.add_trace(go.Scatter(x=series[exercicio]["Data"], y=series[exercicio]["Carga (kg)"],
+                                 mode="lines+markers", name=exercicio, visible=(i == 0)))
+    if not nomes:
+        return fig
+    
+    botoes = [
+        dict(label=exercicio, method="update",
+             args=[{"visible": [j == i for j in range(len(nomes))]}, {"title": f"{titulo} - {exercicio}"}])
+        for i, exercicio in enumerate(nomes)
+    ]
+    fig.update_layout(
+        title=f"{titulo} - {nomes[0]}",
+        yaxis_title="Carga (kg)",
+        showlegend=False,
+        updatemenus=[dict(buttons=botoes, direction="down", x=1, xanchor="right", y=1.15, yanchor="top")]
+    )
+    return fig
+
+def metrics_figure(df_progresso, colunas, titulo):
+    """Linhas das métricas diárias, com média semanal quando o histórico passa do orçamento"""
+    df = downsample(df_progresso[["Data", *colunas]], colunas, "mean")
+    return px.line(df, x="Data", y=colunas, title=titulo)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _figure_json(versao, view, _builder):
+    with timed("figura", alvo=str(view)) as evento:
+        texto = pio.to_json(_builder())
+        evento["bytes"] = len(texto)
+    return texto
+
+def cached_figure(file_key, view, builder):
+    """Figura pronta do cache quando a tabela não mudou desde a última montagem desta visão"""
+    texto = _figure_json(data_version(file_key), view, builder)
+    with timed("figura_carregar", alvo=str(view), bytes=len(texto)):
+        return pio.from_json(texto)
+
+# ⏳ Gravação em segundo plano (write-behind) com diário local
+WRITE_BEHIND = os.environ.get("GYM_WRITE_BEHIND", "1") == "1"
+JOURNAL_PATH = os.environ.get("GYM_JOURNAL_PATH", "data/pending_writes.jsonl")
+WRITER_COALESCE_SECONDS = 2.0  # Janela para juntar cliques seguidos num só commit
+WRITER_RETRY_SECONDS = 30.0  # Espera antes de reenviar quando o GitHub está fora do ar
+
+class WriteBehindQueue:
+    """Fila de gravações: registra no diário local (fsync) e envia ao backend numa thread.
+    
+    Entradas ainda não confirmadas no diário são reenviadas quando o processo reinicia.
+    Várias gravações da mesma tabela são combinadas num único commit por usuário.
+    """
+    
+    def __init__(self, backend_for, journal_path):
+        self.backend_for = backend_for  # usuário -> backend
+        self.journal_path = journal_path
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.pending = self._replay()
+        self.last_error = None
+        os.makedirs(os.path.dirname(journal_path) or ".", exist_ok=True)
+        self.thread = threading.Thread(target=self._run, name="gym-write-behind", daemon=True)
+        self.thread.start()
+        if self.pending:
+            self.wakeup.set()
+    
+    def _replay(self):
+        """Lê o diário e devolve as entradas sem confirmação (ack)"""
+        if not os.path.exists(self.journal_path):
+            return []
+        entradas, confirmadas = [], set()
+        with open(self.journal_path, encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    registro = json.loads(linha)
+                except ValueError:
+                    continue  # Última linha truncada por queda do processo
+                if "ack" in registro:
+                    confirmadas.update(registro["ack"])
+                else:
+                    entradas.append(registro)
+        return [e for e in entradas if e["id"] not in confirmadas]
+    
+    def _journal(self, registro):
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def submit(self, op, file_key, df):
+        """Registra a gravação no diário e retorna sem esperar a rede"""
+        registro = {
+            "id": uuid.uuid4().hex,
+            "op": op,
+            "file_key": file_key,
+            "usuario": current_user(),
+            "rows": to_records(df, file_key),
+            "ts": time.time()
+        }
+        with self.lock:
+            self._journal(registro)
+            self.pending.append(registro)
+        self.wakeup.set()
+    
+    def _mine(self, e, file_key=None):
+        # Entradas de diários antigos, sem usuário, são do usuário padrão
+        return e.get("usuario", DEFAULT_USER) == current_user() and file_key in (None, e["file_key"])
+    
+    def pending_count(self):
+        with self.lock:
+            return sum(1 for e in self.pending if self._mine(e))
+    
+    def pending_ids(self, file_key):
+        with self.lock:
+            return [e["id"] for e in self.pending if self._mine(e, file_key)]
+    
+    def pending_ops(self, file_key):
+        """Gravações pendentes de uma tabela do usuário atual, em ordem, como (op, DataFrame)"""
+        with self.lock:
+            entradas = [e for e in self.pending if self._mine(e, file_key)]
+        return [(e["op"], coerce_schema(pd.DataFrame(e["rows"]), file_key)) for e in entradas]
+    
+    def _coalesce(self, entradas):
+        """Combina as entradas por tabela: o último save vence e as gravações seguintes são aplicadas sobre ele.
+        
+        Cada tabela termina em um só tipo de operação; appends seguidos de upsert viram parte do upsert.
+        """
+        saves, appends, upserts = {}, {}, {}
+        for e in entradas:
+            file_key = e["file_key"]
+            df = coerce_schema(pd.DataFrame(e["rows"]), file_key)
+            if e["op"] == "save":
+                saves[file_key] = df
+                appends.pop(file_key, None)
+                upserts.pop(file_key, None)
+            elif file_key in saves:
+                base = saves[file_key]
+                saves[file_key] = _merge_rows(base, df, file_key) if e["op"] == "upsert" else \
+                    pd.concat([base, df], ignore_index=True)
+            elif e["op"] == "upsert" or file_key in upserts:
+                base = upserts.pop(file_key, appends.pop(file_key, None))
+                if base is None:
+                    upserts[file_key] = df
+                elif e["op"] == "upsert":
+                    upserts[file_key] = _merge_rows(base, df, file_key)
+                else:
+                    upserts[file_key] = pd.concat([base, df], ignore_index=True)
+            else:
+                anteriores = appends.get(file_key)
+                appends[file_key] = df if anteriores is None else pd.concat([anteriores, df], ignore_index=True)
+        return saves, appends, upserts
+    
+    def flush(self):
+        """Envia tudo o que está pendente, um lote por usuário; retorna True se nada ficou para trás"""
+        with self.lock:
+            entradas = list(self.pending)
+        if not entradas:
+            return True
+        
+        por_usuario = {}
+        for e in entradas:
+            por_usuario.setdefault(e.get("usuario", DEFAULT_USER), []).append(e)
+        ids, erro = set(), None
+        for usuario, lote in por_usuario.items():
+            try:
+                saves, appends, upserts = self._coalesce(lote)
+                with user_scope(usuario):
+                    ok = write_tables(saves, appends, upserts, backend=self.backend_for(usuario))
+            except requests.RequestException as e:
+                ok = False
+                erro = f"Sem conexão com o GitHub: {e.__class__.__name__}"
+            except Exception as e:
+                # Resposta inesperada, dados ou backend: fica no diário e volta a tentar
+                logging.getLogger("gym.writer").exception(f"Falha ao gravar a fila de {usuario}")
+                ok = False
+                erro = f"Erro ao gravar: {e.__class__.__name__}"
+            else:
+                erro = erro if ok else "O GitHub recusou a gravação"
+            if ok:
+                ids.update(e["id"] for e in lote)
+        self.last_error = erro
+        if not ids:
+            return False
+        
+        with self.lock:
+            self.pending = [e for e in self.pending if e["id"] not in ids]
+            if self.pending:
+                self._journal({"ack": sorted(ids)})
+            else:
+                # Nada pendente: o diário pode recomeçar vazio
+                with open(self.journal_path, "w", encoding="utf-8") as f:
+                    f.flush()
+                    os.fsync(f.fileno())
+        return erro is None
+    
+    def _run(self):
+        while True:
+            self.wakeup.wait()
+            time.sleep(WRITER_COALESCE_SECONDS)
+            self.wakeup.clear()
+            try:
+                enviado = self.flush()
+            except Exception as e:
+                # A thread é única no processo: se morrer, nada mais é enviado até reiniciar
+                logging.getLogger("gym.writer").exception("Falha no escritor em segundo plano")
+                self.last_error = f"Erro ao gravar: {e.__class__.__name__}"
+                enviado = False
+            if not enviado:
+                time.sleep(WRITER_RETRY_SECONDS)
+                self.wakeup.set()
+
+@st.cache_resource
+def get_writer():
+    """Escritor em segundo plano do processo; ao ser criado reenvia o que ficou no diário"""
+    return WriteBehindQueue(backend_for, JOURNAL_PATH)
+
+def queue_save(df, file_key):
+    """Substitui uma tabela sem bloquear a interface (ou direto, se o write-behind estiver desligado)"""
+    if not WRITE_BEHIND:
+        return save_data(df, file_key)
+    get_writer().submit("save", file_key, df)
+    return True
+
+def queue_upsert(df, file_key):
+    """Faz upsert por chave sem bloquear a interface (ou direto, se o write-behind estiver desligado)"""
+    if not WRITE_BEHIND:
+        return upsert_data(df, file_key)
+    get_writer().submit("upsert", file_key, df)
     return True
 
+def queue_changes(df, file_key):
+    """Upsert só das linhas que mudaram em relação ao salvo (e à fila); retorna quantas foram enviadas, ou None se falhou.
+    
+    A comparação usa só o que está em cache, sem rede: salvar de novo o mesmo conteúdo
+    não gera gravação nenhuma, e offline a gravação vai para a fila sem comparar.
+    """
+    df = coerce_schema(df, file_key)
+    df = df[~row_keys(df, file_key).duplicated(keep="last")]
+    if df.empty:
+        return 0
+    try:
+        # Só o cache: salvar não pode esperar pelo GitHub nem falhar sem ele; sem cache, envia tudo
+        with cached_only():
+            salvo = load_data(file_key, desde=df["Data"].min(), ate=df["Data"].max())
+    except (NotCached, requests.RequestException):
+        salvo = None
+    if salvo is not None:
+        _, iguais = compare_rows(df, salvo, file_key)
+        df = df[~iguais]
+    if df.empty:
+        return 0
+    return len(df) if queue_upsert(df, file_key) else None
+
+def dedupe_table(file_key):
+    """Regrava a tabela sem chaves repetidas (e sem exercícios não feitos); retorna as linhas removidas, ou None se falhou"""
+    df, removidas = dedupe_rows(load_data(file_key), file_key)
+    if removidas and not queue_save(df, file_key):
+        return None
+    return removidas
+
+def _logged_in_user():
+    """E-mail (ou nome) do usuário autenticado pelo login do Streamlit, se configurado"""
+    try:
+        if st.user.is_logged_in:
+            return st.user.get("email") or st.user.get("name")
+    except Exception:
+        pass  # Sem autenticação configurada: o usuário é escolhido na barra lateral
+    return None
+
+def select_user():
+    """Define o usuário da sessão (autenticado, ?usuario= na URL ou escolhido); None enquanto não há um"""
+    identidade = _logged_in_user()
+    if identidade:
+        if st.session_state.get("usuario_login") != identidade:
+            usuario = register_user(identidade)
+            if usuario is None:
+                # Sem marcar o login como registrado: o próximo rerun tenta de novo
+                st.error(f"Não foi possível registrar o usuário {identidade}.")
+                st.button("Tentar de novo")
+                return None
+            st.session_state.usuario = usuario
+            st.session_state.usuario_login = identidade
+        st.sidebar.caption(f"👤 {identidade}")
+        return st.session_state.usuario
+    
+    usuarios = load_users()
+    if "usuario" not in st.session_state and st.query_params.get("usuario") in usuarios:
+        st.session_state.usuario = st.query_params["usuario"]
+    opcoes = [*usuarios, "➕ Novo usuário"]
+    atual = st.session_state.get("usuario")
+    escolha = st.sidebar.selectbox("👤 Usuário", opcoes, format_func=lambda u: usuarios.get(u, {}).get("nome", u),
+                                   index=opcoes.index(atual) if atual in opcoes else 0)
+    if escolha == "➕ Novo usuário":
+        nome = st.sidebar.text_input("Nome do novo usuário")
+        if st.sidebar.button("Criar usuário") and nome:
+            novo = register_user(nome, novo=True)
+            if novo:
+                st.session_state.usuario = novo
+                st.rerun()
+        return None
+    st.session_state.usuario = escolha
+    return escolha
+
+# 👥 Usuário da sessão: cada um lê e grava só o próprio shard
+if MULTI_USER and select_user() is None:
+    if not _logged_in_user():
+        st.info("Escolha ou crie um usuário na barra lateral para começar.")
+    st.stop()
+
 # 🧭 Navegação por abas
+_rerun_inicio = time.perf_counter()
+dados = RunData()
 aba = st.sidebar.selectbox("📂 Navegação", ["📅 Treino Diário", "📊 Progresso", "🏆 Metas", "⚙️ Configurações"])
 
+# ☁️ Backup periódico do backend local no GitHub
+get_backend().maybe_sync()
+
 # 📅 Dias da semana
 dias = {
     0: "Segunda",
@@ -122,27 +2203,29 @@ dias = {
 }
 hoje = datetime.now().weekday()
 dia_semana = dias[hoje]
-data_atual = datetime.now().strftime("%d/%m/%Y")
+data_atual = datetime.now().strftime(DATE_FORMAT_BR)
 
 # 📋 Exercícios por dia (configurável)
-if 'treino_por_dia' not in st.session_state:
-    st.session_state.treino_por_dia = {
-        "Segunda": {
-            "Costas": ["Serrote", "Remada Baixa", "Puxada Frontal", "Puxada Traseira"],
-            "Bíceps": ["Bíceps Martelo", "Bíceps na Polia"]
-        },
-        "Quarta": {
-            "Peito": ["Supino Plano", "Supino Inclinado", "Aberturas Planas", "Peck Deck"],
-            "Tríceps": ["Tríceps Francês na Polia", "Tríceps Corda"]
-        },
-        "Quinta": {
-            "Ombros": ["Press Militar", "Elevação Lateral", "Elevação Frontal"],
-            "Abdômen": ["Elevação das Pernas", "Prancha", "Abdominais"]
-        },
-        "Sexta": {
-            "Pernas": ["Agachamento", "Leg Press", "Extensora", "Adutora", "Mesa Flexora", "Gêmeos na Máquina"]
-        }
+TREINO_PADRAO = {
+    "Segunda": {
+        "Costas": ["Serrote", "Remada Baixa", "Puxada Frontal", "Puxada Traseira"],
+        "Bíceps": ["Bíceps Martelo", "Bíceps na Polia"]
+    },
+    "Quarta": {
+        "Peito": ["Supino Plano", "Supino Inclinado", "Aberturas Planas", "Peck Deck"],
+        "Tríceps": ["Tríceps Francês na Polia", "Tríceps Corda"]
+    },
+    "Quinta": {
+        "Ombros": ["Press Militar", "Elevação Lateral", "Elevação Frontal"],
+        "Abdômen": ["Elevação das Pernas", "Prancha", "Abdominais"]
+    },
+    "Sexta": {
+        "Pernas": ["Agachamento", "Leg Press", "Extensora", "Adutora", "Mesa Flexora", "Gêmeos na Máquina"]
     }
+}
+
+if 'treino_por_dia' not in st.session_state:
+    st.session_state.treino_por_dia = copy.deepcopy(TREINO_PADRAO)
 
 # 🏋️‍♂️ ABA DE TREINO DIÁRIO
 if aba == "📅 Treino Diário":
@@ -165,44 +2248,54 @@ if aba == "📅 Treino Diário":
                 for grupo, exercicios in grupos.items():
                     st.write(f"- {grupo}: {', '.join(exercicios)}")
         
-        registros = []
-        for grupo, exercicios in st.session_state.treino_por_dia[dia_semana].items():
-            st.markdown(f"### {grupo}")
-            cols = st.columns(3)
+        # Formulário: mudar carga, repetições ou observações não reexecuta a página; só o envio
+        with st.form("treino_do_dia", border=False):
+            registros = []
+            for grupo, exercicios in st.session_state.treino_por_dia[dia_semana].items():
+                st.markdown(f"### {grupo}")
+                cols = st.columns(3)
+                
+                for i, exercicio in enumerate(exercicios):
+                    with cols[i % 3]:
+                        with st.container(border=True):
+                            st.write(f"**{exercicio}**")
+                            carga = st.number_input("Carga (kg)", min_value=0.0, step=2.5, key=f"{exercicio}_carga")
+                            repeticoes = st.number_input("Repetições", min_value=0, step=1, key=f"{exercicio}_rep")
+                            series = st.number_input("Séries", min_value=0, step=1, key=f"{exercicio}_series", value=3)
+                            observacoes = st.text_input("Observações", key=f"{exercicio}_obs")
+                            
+                            registros.append({
+                                "Data": datetime.now().strftime("%Y-%m-%d"),
+                                "Dia": dia_semana,
+                                "Grupo Muscular": grupo,
+                                "Exercício": exercicio,
+                                "Carga (kg)": carga,
+                                "Repetições": repeticoes,
+                                "Séries": series,
+                                "Observações": observacoes
+                            })
             
-            for i, exercicio in enumerate(exercicios):
-                with cols[i % 3]:
-                    with st.container(border=True):
-                        st.write(f"**{exercicio}**")
-                        carga = st.number_input("Carga (kg)", min_value=0.0, step=2.5, key=f"{exercicio}_carga")
-                        repeticoes = st.number_input("Repetições", min_value=0, step=1, key=f"{exercicio}_rep")
-                        series = st.number_input("Séries", min_value=0, step=1, key=f"{exercicio}_series", value=3)
-                        observacoes = st.text_input("Observações", key=f"{exercicio}_obs")
-                        
-                        registros.append({
-                            "Data": datetime.now().strftime("%Y-%m-%d"),
-                            "Dia": dia_semana,
-                            "Grupo Muscular": grupo,
-                            "Exercício": exercicio,
-                            "Carga (kg)": carga,
-                            "Repetições": repeticoes,
-                            "Séries": series,
-                            "Observações": observacoes
-                        })
-
-        col1, col2 = st.columns(2)
-        with col1:
-            if st.button("💾 Salvar Treino", type="primary"):
-                df_novo = pd.DataFrame(registros)
-                df_antigo = load_data_from_github("treinos")
-                df_total = pd.concat([df_antigo, df_novo], ignore_index=True)
-                if save_data_to_github(df_total, "treinos"):
-                    st.success("✅ Treino salvo com sucesso no GitHub!")
+            salvar_treino = st.form_submit_button("💾 Salvar Treino", type="primary")
+        
+        if salvar_treino:
+            # Só os exercícios preenchidos; salvar de novo atualiza as linhas do dia em vez de duplicar
+            df_novo = pd.DataFrame(registros)
+            df_novo = df_novo[performed_sets(df_novo)]
+            if df_novo.empty:
+                st.warning("Preencha a carga ou as repetições de pelo menos um exercício.")
+            else:
+                enviadas = queue_changes(df_novo, "treinos")
+                if enviadas == 0:
+                    st.info("Nada mudou desde o último salvamento.")
+                elif enviadas:
+                    st.success("✅ Treino salvo com sucesso!")
                     st.balloons()
         
-        with col2:
+        # Fragmento: abrir o histórico reexecuta só este trecho
+        @st.fragment
+        def historico_do_dia():
             if st.button("📈 Ver Histórico"):
-                df = load_data_from_github("treinos")
+                df = as_float64(dados.load("treinos"))
                 if not df.empty:
                     st.dataframe(
                         df[df["Dia"] == dia_semana].sort_values("Data", ascending=False),
@@ -210,151 +2303,187 @@ if aba == "📅 Treino Diário":
                         use_container_width=True
                     )
                     
-                    # Gráfico de progresso para cada exercício
+                    # Um único gráfico com os exercícios do dia (menu para alternar)
                     exercicios_dia = [ex for grupo in st.session_state.treino_por_dia[dia_semana].values() for ex in grupo]
-                    for exercicio in exercicios_dia:
-                        df_ex = df[df["Exercício"] == exercicio]
-                        if not df_ex.empty:
-                            fig = px.line(df_ex, x="Data", y="Carga (kg)", title=f"Progresso - {exercicio}")
-                            st.plotly_chart(fig, use_container_width=True)
+                    if df["Exercício"].isin(exercicios_dia).any():
+                        fig = cached_figure("treinos", ("historico", tuple(exercicios_dia)),
+                                            lambda: exercise_history_figure(df, exercicios_dia))
+                        st.plotly_chart(fig, use_container_width=True)
                 else:
                     st.warning("Ainda não há registros salvos.")
+        
+        historico_do_dia()
 
 # 📊 ABA DE PROGRESSO
 elif aba == "📊 Progresso":
     st.title("📊 Progresso Corporal & Estilo de Vida")
     
-    tab1, tab2, tab3 = st.tabs(["📈 Métricas Diárias", "🏋️‍♂️ Evolução de Cargas", "📅 Calendário de Treinos"])
+    # Só a aba aberta executa: as outras não leem dados nem montam gráficos
+    tab1, tab2, tab3 = st.tabs(["📈 Métricas Diárias", "🏋️‍♂️ Evolução de Cargas", "📅 Calendário de Treinos"],
+                               key="abas_progresso", on_change="rerun")
     
-    with tab1:
-        st.subheader("Registro Diário")
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            peso = st.number_input("Peso (kg)", min_value=0.0, step=0.1)
-            sono = st.number_input("Horas de sono (últimas 24h)", min_value=0.0, max_value=24.0, step=0.5)
-        
-        with col2:
-            cansaco = st.slider("Nível de cansaço (0-10)", 0, 10)
-            humor = st.select_slider("Humor", options=["😭", "😞", "😐", "🙂", "😁"])
-        
-        with col3:
-            calorias = st.number_input("Calorias ingeridas (opcional)", min_value=0.0, step=50.0)
-            agua = st.number_input("Copos de água (250ml)", min_value=0, step=1)
-        
-        if st.button("💾 Salvar Progresso Diário"):
-            df_novo = pd.DataFrame([{
-                "Data": datetime.now().strftime("%Y-%m-%d"),
-                "Peso (kg)": peso,
-                "Horas de Sono": sono,
-                "Cansaço": cansaco,
-                "Humor": humor,
-                "Calorias": calorias if calorias > 0 else None,
-                "Água (copos)": agua
-            }])
-            
-            df_antigo = load_data_from_github("progresso")
-            df_total = pd.concat([df_antigo, df_novo], ignore_index=True)
-            if save_data_to_github(df_total, "progresso"):
-                st.success("✅ Progresso salvo com sucesso no GitHub!")
-        
-        st.divider()
-        st.subheader("Histórico de Progresso")
-        
-        df_progresso = load_data_from_github("progresso")
-        if not df_progresso.empty:
-            df_progresso["Data"] = pd.to_datetime(df_progresso["Data"])
-            
-            # Mostrar métricas recentes
-            ultimo_registro = df_progresso.iloc[-1]
-            cols = st.columns(4)
-            with cols[0]:
-                st.metric("Último Peso", f"{ultimo_registro['Peso (kg)']} kg")
-            with cols[1]:
-                st.metric("Média de Sono", f"{df_progresso['Horas de Sono'].mean():.1f} horas")
-            with cols[2]:
-                st.metric("Média de Água", f"{df_progresso['Água (copos)'].mean():.1f} copos/dia")
-            with cols[3]:
-                st.metric("Dias Registrados", len(df_progresso))
-            
-            # Gráficos
-            fig = px.line(df_progresso, x="Data", y=["Peso (kg)", "Horas de Sono", "Água (copos)"],
-                         title="Progresso ao Longo do Tempo")
-            st.plotly_chart(fig, use_container_width=True)
-            
-            st.dataframe(df_progresso.sort_values("Data", ascending=False), hide_index=True)
-        else:
-            st.warning("Nenhum progresso registrado ainda.")
-    
-    with tab2:
-        st.subheader("Evolução de Cargas")
-        df_treinos = load_data_from_github("treinos")
-        
-        if not df_treinos.empty:
-            # Selecionar exercício para análise
-            exercicio_selecionado = st.selectbox("Escolha um exercício", df_treinos["Exercício"].unique())
-            
-            df_exercicio = df_treinos[df_treinos["Exercício"] == exercicio_selecionado].sort_values("Data")
-            
-            if not df_exercicio.empty:
-                # Gráfico de progresso
-                fig = px.line(df_exercicio, x="Data", y="Carga (kg)", 
-                             title=f"Progresso no {exercicio_selecionado}",
-                             markers=True)
-                st.plotly_chart(fig, use_container_width=True)
-                
-                # Estatísticas
+    if tab1.open:
+        with tab1:
+            st.subheader("Registro Diário")
+            # Formulário: mexer nos campos não recarrega o histórico nem o gráfico; só o envio
+            with st.form("progresso_do_dia", border=False):
                 col1, col2, col3 = st.columns(3)
+                
                 with col1:
-                    st.metric("Maior Carga", f"{df_exercicio['Carga (kg)'].max()} kg")
+                    peso = st.number_input("Peso (kg)", min_value=0.0, step=0.1)
+                    sono = st.number_input("Horas de sono (últimas 24h)", min_value=0.0, max_value=24.0, step=0.5)
+                
                 with col2:
-                    st.metric("Média Recente", f"{df_exercicio.tail(3)['Carga (kg)'].mean():.1f} kg")
+                    cansaco = st.slider("Nível de cansaço (0-10)", 0, 10)
+                    humor = st.select_slider("Humor", options=["😭", "😞", "😐", "🙂", "😁"])
+                
                 with col3:
-                    progresso = df_exercicio['Carga (kg)'].iloc[-1] - df_exercicio['Carga (kg)'].iloc[0]
-                    st.metric("Progresso Total", f"{progresso:.1f} kg")
+                    calorias = st.number_input("Calorias ingeridas (opcional)", min_value=0.0, step=50.0)
+                    agua = st.number_input("Copos de água (250ml)", min_value=0, step=1)
+                
+                salvar_progresso = st.form_submit_button("💾 Salvar Progresso Diário")
+            
+            if salvar_progresso:
+                df_novo = pd.DataFrame([{
+                    "Data": datetime.now().strftime("%Y-%m-%d"),
+                    "Peso (kg)": peso,
+                    "Horas de Sono": sono,
+                    "Cansaço": cansaco,
+                    "Humor": humor,
+                    "Calorias": calorias if calorias > 0 else None,
+                    "Água (copos)": agua
+                }])
+                
+                # Um registro por dia: salvar de novo substitui o do dia
+                enviadas = queue_changes(df_novo, "progresso")
+                if enviadas == 0:
+                    st.info("Nada mudou desde o último salvamento.")
+                elif enviadas:
+                    st.success("✅ Progresso salvo com sucesso!")
+            
+            st.divider()
+            st.subheader("Histórico de Progresso")
+            
+            df_progresso = as_float64(dados.load("progresso"))
+            if not df_progresso.empty:
+                # Mostrar métricas recentes
+                ultimo_registro = df_progresso.iloc[-1]
+                cols = st.columns(4)
+                with cols[0]:
+                    st.metric("Último Peso", f"{ultimo_registro['Peso (kg)']} kg")
+                with cols[1]:
+                    st.metric("Média de Sono", f"{df_progresso['Horas de Sono'].mean():.1f} horas")
+                with cols[2]:
+                    st.metric("Média de Água", f"{df_progresso['Água (copos)'].mean():.1f} copos/dia")
+                with cols[3]:
+                    st.metric("Dias Registrados", len(df_progresso))
+                
+                # Gráficos
+                fig = cached_figure("progresso", "metricas", lambda: metrics_figure(
+                    df_progresso, ["Peso (kg)", "Horas de Sono", "Água (copos)"], "Progresso ao Longo do Tempo"))
+                st.plotly_chart(fig, use_container_width=True)
                 
-                # Tabela com todos os registros
-                st.dataframe(df_exercicio, hide_index=True)
+                st.dataframe(df_progresso.sort_values("Data", ascending=False), hide_index=True)
             else:
-                st.warning("Nenhum dado encontrado para este exercício.")
-        else:
-            st.warning("Nenhum treino registrado ainda.")
-    
-    with tab3:
-        st.subheader("Frequência de Treinos")
-        df_treinos = load_data_from_github("treinos")
+                st.warning("Nenhum progresso registrado ainda.")
         
-        if not df_treinos.empty:
-            df_treinos["Data"] = pd.to_datetime(df_treinos["Data"])
-            
-            # Contagem de treinos por dia
-            df_frequencia = df_treinos.groupby("Dia").size().reset_index(name="Contagem")
-            fig = px.bar(df_frequencia, x="Dia", y="Contagem", 
-                         title="Treinos por Dia da Semana",
-                         color="Dia")
-            st.plotly_chart(fig, use_container_width=True)
+    if tab2.open:
+        with tab2:
+            st.subheader("Evolução de Cargas")
+            resumo = dados.summary()
+            exercicios_registrados = [ex for ex in resumo["Exercício"] if ex != SUMMARY_TOTAL]
             
-            # Calendário de treinos (últimos 30 dias)
-            data_limite = datetime.now() - timedelta(days=30)
-            df_recente = df_treinos[df_treinos["Data"] >= data_limite]
+            if exercicios_registrados:
+                # Fragmento: trocar de exercício reexecuta só a análise, não a página
+                @st.fragment
+                def evolucao_exercicio():
+                    # Selecionar exercício para análise
+                    exercicio_selecionado = st.selectbox("Escolha um exercício", exercicios_registrados)
+                    
+                    df_exercicio = dados.load("treinos", exercicio=exercicio_selecionado,
+                                              colunas=COLUNAS_CARGAS).sort_values("Data")
+                    
+                    linha = summary_row(resumo, exercicio_selecionado)
+                    if not df_exercicio.empty and linha is not None:
+                        # Gráfico de progresso
+                        fig = cached_figure("treinos", ("evolucao", exercicio_selecionado), lambda: px.line(
+                            downsample(df_exercicio[["Data", "Carga (kg)"]], ["Carga (kg)"], "max"),
+                            x="Data", y="Carga (kg)", title=f"Progresso no {exercicio_selecionado}", markers=True))
+                        st.plotly_chart(fig, use_container_width=True)
+                        
+                        # Estatísticas (lidas do índice agregado, sem varrer o histórico)
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            st.metric("Maior Carga", f"{linha['Carga Máx (kg)']} kg")
+                        with col2:
+                            st.metric("Média Recente", f"{linha['Média Recente (kg)']:.1f} kg")
+                        with col3:
+                            progresso = linha["Carga Final (kg)"] - linha["Carga Inicial (kg)"]
+                            st.metric("Progresso Total", f"{progresso:.1f} kg")
+                        st.caption(f"{int(linha['Sessões'])} sessões · volume total {linha['Volume Total (kg)']:.0f} kg · "
+                                   f"1RM estimado {linha['1RM Estimado (kg)']:.1f} kg")
+                        
+                        # Tabela com todos os registros
+                        st.dataframe(as_float64(df_exercicio), hide_index=True)
+                    else:
+                        st.warning("Nenhum dado encontrado para este exercício.")
+                
+                evolucao_exercicio()
+            else:
+                st.warning("Nenhum treino registrado ainda.")
+        
+    if tab3.open:
+        with tab3:
+            st.subheader("Frequência de Treinos")
+            df_frequencia = dados.value_counts("treinos", "Dia")
             
-            if not df_recente.empty:
-                st.write("**Últimos Treinos:**")
-                for _, row in df_recente.sort_values("Data", ascending=False).iterrows():
-                    with st.container(border=True):
-                        st.write(f"**{row['Data'].strftime('%d/%m')}** - {row['Dia']}")
-                        st.write(f"{row['Grupo Muscular']}: {row['Exercício']} ({row['Carga (kg)']}kg)")
+            if not df_frequencia.empty:
+                # Contagem de treinos por dia
+                fig = px.bar(df_frequencia, x="Dia", y="Contagem", 
+                             title="Treinos por Dia da Semana",
+                             color="Dia")
+                st.plotly_chart(fig, use_container_width=True)
+                
+                # Calendário de treinos: um dia por linha numa única tabela paginada; período e página
+                # reexecutam só o fragmento
+                @st.fragment
+                def calendario_recente():
+                    periodo = st.selectbox("Período", [30, 90, 365], format_func=lambda d: f"Últimos {d} dias")
+                    data_limite = (datetime.now() - timedelta(days=periodo)).date()  # Mesma chave nas reexecuções do fragmento
+                    df_recente = dados.load("treinos", desde=data_limite, colunas=COLUNAS_CALENDARIO)
+                    
+                    if not df_recente.empty:
+                        calendario = build_calendar(df_recente)
+                        
+                        fig = px.density_heatmap(calendario, x="Semana", y="Dia da Semana", z="Exercícios Feitos",
+                                                 histfunc="sum", title="Exercícios por Dia",
+                                                 category_orders={"Dia da Semana": list(dias.values())})
+                        st.plotly_chart(fig, use_container_width=True)
+                        
+                        st.write("**Últimos Treinos:**")
+                        paginas = max(1, -(-len(calendario) // CALENDAR_PAGE_DAYS))
+                        pagina = st.number_input("Página", min_value=1, max_value=paginas, value=1, step=1) if paginas > 1 else 1
+                        inicio = (pagina - 1) * CALENDAR_PAGE_DAYS
+                        st.dataframe(
+                            calendario.iloc[inicio:inicio + CALENDAR_PAGE_DAYS][["Data", "Dia", "Grupos", "Exercícios", "Volume (kg)"]],
+                            hide_index=True,
+                            use_container_width=True,
+                            column_config={"Data": st.column_config.DateColumn("Data", format="DD/MM")}
+                        )
+                    else:
+                        st.info(f"Nenhum treino registrado nos últimos {periodo} dias.")
+                
+                calendario_recente()
             else:
-                st.info("Nenhum treino registrado nos últimos 30 dias.")
-        else:
-            st.warning("Nenhum treino registrado ainda.")
+                st.warning("Nenhum treino registrado ainda.")
 
 # 🎯 ABA DE METAS
 elif aba == "🏆 Metas":
     st.title("🏆 Metas e Objetivos")
     
-    # Carregar metas salvas ou usar padrão
-    df_metas = load_data_from_github("metas")
+    # Carregar metas salvas ou usar padrão (progresso e o índice de treinos vêm junto, em paralelo)
+    dados.prefetch(["metas", "progresso", "resumo"])
+    df_metas = dados.load("metas")
     
     if df_metas.empty:
         metas_padrao = [
@@ -370,53 +2499,47 @@ elif aba == "🏆 Metas":
     with col1:
         st.subheader("Definir Metas")
         
-        metas_editaveis = []
-        for _, row in df_metas.iterrows():
-            novo_valor = st.number_input(
-                f"{row['Meta']} (alvo)", 
-                value=row["Valor"],
-                key=f"meta_{row['Meta']}"
-            )
-            metas_editaveis.append({
-                "Meta": row["Meta"],
-                "Valor": novo_valor,
-                "Atual": row["Atual"]
-            })
+        # Formulário: ajustar os alvos não reexecuta a página; só o envio
+        with st.form("metas", border=False):
+            metas_editaveis = []
+            for _, row in df_metas.iterrows():
+                novo_valor = st.number_input(
+                    f"{row['Meta']} (alvo)", 
+                    value=float(row["Valor"]),
+                    key=f"meta_{row['Meta']}"
+                )
+                metas_editaveis.append({
+                    "Meta": row["Meta"],
+                    "Valor": novo_valor,
+                    "Atual": row["Atual"]
+                })
+            
+            salvar_metas = st.form_submit_button("Salvar Metas")
         
-        if st.button("Salvar Metas"):
+        if salvar_metas:
             df_metas = pd.DataFrame(metas_editaveis)
-            if save_data_to_github(df_metas, "metas"):
-                st.success("Metas atualizadas com sucesso no GitHub!")
+            if queue_save(df_metas, "metas"):
+                st.success("Metas atualizadas com sucesso!")
     
     with col2:
         st.subheader("Progresso das Metas")
         
         # Atualizar valores atuais
-        df_progresso = load_data_from_github("progresso")
-        df_treinos = load_data_from_github("treinos")
+        df_metas = goal_progress(df_metas, dados.load("progresso"), dados.summary())
         
-        for i, row in df_metas.iterrows():
-            if row["Meta"] == "Peso" and not df_progresso.empty:
-                df_metas.at[i, "Atual"] = df_progresso["Peso (kg)"].iloc[-1]
-            elif row["Meta"] == "Agachamento" and not df_treinos.empty:
-                if "Agachamento" in df_treinos["Exercício"].values:
-                    df_metas.at[i, "Atual"] = df_treinos[df_treinos["Exercício"] == "Agachamento"]["Carga (kg)"].max()
-            elif row["Meta"] == "Supino" and not df_treinos.empty:
-                if "Supino Plano" in df_treinos["Exercício"].values:
-                    df_metas.at[i, "Atual"] = df_treinos[df_treinos["Exercício"] == "Supino Plano"]["Carga (kg)"].max()
-            elif row["Meta"] == "Dias de Treino" and not df_treinos.empty:
-                df_metas.at[i, "Atual"] = df_treinos["Data"].nunique()
         
-        # Mostrar progresso
-        for _, row in df_metas.iterrows():
-            with st.container(border=True):
-                st.write(f"**{row['Meta']}**")
-                if pd.notna(row["Atual"]):
-                    progresso = (row["Atual"] / row["Valor"]) * 100
-                    st.progress(min(int(progresso), 100), 
-                              f"{row['Atual']} / {row['Valor']} ({min(progresso, 100):.1f}%)")
-                else:
-                    st.info("Dados insuficientes para calcular progresso")
+        # Mostrar progresso numa única tabela
+        st.dataframe(
+            df_metas[["Meta", "Atual", "Valor", "Progresso"]],
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "Valor": st.column_config.NumberColumn("Alvo"),
+                "Progresso": st.column_config.ProgressColumn("Progresso", min_value=0, max_value=100, format="%.1f%%")
+            }
+        )
+        if df_metas["Atual"].isna().any():
+            st.caption("Metas sem valor atual ainda não têm dados suficientes para calcular o progresso.")
 
 # ⚙️ ABA DE CONFIGURAÇÕES
 elif aba == "⚙️ Configurações":
@@ -459,12 +2582,19 @@ elif aba == "⚙️ Configurações":
     col1, col2 = st.columns(2)
     
     with col1:
-        # Exportar dados
-        df_treinos = load_data_from_github("treinos")
-        if not df_treinos.empty:
+        # Exportar dados (o CSV só é montado no clique; o índice diz se há o que exportar)
+        total = summary_row(dados.summary(), SUMMARY_TOTAL)
+        if total is not None:
+            usuario = current_user()
+            
+            def exportar_treinos():
+                # Roda numa thread à parte, fora da sessão: o usuário vai junto
+                with user_scope(usuario):
+                    return to_csv_text(load_data("treinos"), "treinos").encode("utf-8")
+            
             st.download_button(
                 label="📤 Exportar Dados de Treino",
-                data=df_treinos.to_csv(index=False).encode("utf-8"),
+                data=exportar_treinos,
                 file_name="treinos_backup.csv",
                 mime="text/csv"
             )
@@ -476,18 +2606,129 @@ elif aba == "⚙️ Configurações":
         uploaded_file = st.file_uploader("📥 Importar Dados", type=["csv"])
         if uploaded_file is not None:
             try:
-                df = pd.read_csv(uploaded_file)
-                
-                # Verificar se é um arquivo válido
-                if "Exercício" in df.columns and "Carga (kg)" in df.columns:
-                    if save_data_to_github(df, "treinos"):
-                        st.success("Dados de treino importados com sucesso para o GitHub!")
-                elif "Peso (kg)" in df.columns and "Horas de Sono" in df.columns:
-                    if save_data_to_github(df, "progresso"):
-                        st.success("Dados de progresso importados com sucesso para o GitHub!")
-                else:
+                # Verificar se é um arquivo válido (só o cabeçalho e as primeiras linhas)
+                amostra = pd.read_csv(uploaded_file, nrows=5)
+                uploaded_file.seek(0)
+                file_key = detect_table(amostra.columns)
+                if file_key is None:
                     st.error("Formato de arquivo não reconhecido")
-                
-                st.dataframe(df.head())
+                else:
+                    st.dataframe(amostra)
+                    st.caption("As linhas são mescladas com o histórico pela data"
+                               + (" e exercício" if file_key == "treinos" else "")
+                               + ": as repetidas são ignoradas e as diferentes substituem as salvas.")
+                    if st.button("📥 Importar", type="primary"):
+                        barra = st.progress(0.0, text="Importando...")
+                        
+                        def mostrar_progresso(contagens):
+                            lido = min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0)
+                            barra.progress(lido, text=f"{contagens['lidas']} linhas lidas, "
+                                                      f"{contagens['gravadas']} gravadas")
+                        
+                        contagens, problemas = import_csv(uploaded_file, file_key, progresso=mostrar_progresso)
+                        barra.empty()
+                        for problema in problemas:
+                            st.warning(problema)
+                        resultado = (f"{contagens['novas']} novas, {contagens['atualizadas']} atualizadas, "
+                                     f"{contagens['iguais']} já existentes, {contagens['repetidas']} repetidas no arquivo")
+                        if contagens["falhas"]:
+                            st.error(f"Importação interrompida ({contagens['gravadas']} linhas gravadas). {resultado}")
+                        else:
+                            st.success(f"Dados de {file_key} importados: {resultado}")
             except Exception as e:
-                st.error(f"Erro ao carregar arquivo: {e}")
\ No newline at end of file
+                st.error(f"Erro ao carregar arquivo: {e}")
+    
+    st.divider()
+    st.subheader("Índice de Exercícios")
+    st.caption("Recalcula o resumo por exercício (cargas, volume, 1RM, sessões) a partir do histórico completo.")
+    if st.button("🔄 Reconstruir Índice"):
+        if queue_save(build_summary(dados.load("treinos")), "resumo"):
+            st.success("Índice reconstruído!")
+    
+    st.divider()
+    st.subheader("Limpeza do Histórico")
+    st.caption("Remove registros repetidos do mesmo dia (fica o último) e exercícios salvos sem carga nem repetições.")
+    if st.button("🧽 Remover Duplicados"):
+        for file_key in ("treinos", "progresso"):
+            removidas = dedupe_table(file_key)
+            if removidas is not None:
+                st.success(f"{file_key}: {removidas} linha(s) removida(s)")
+    
+    if STORAGE_BACKEND == "sqlite":
+        st.divider()
+        st.subheader("Banco Local (SQLite)")
+        st.caption(f"Os dados ficam em {sqlite_path()} e são copiados para o GitHub periodicamente.")
+        if st.button("☁️ Sincronizar com GitHub"):
+            if get_backend().export_to_github():
+                st.success("Backup enviado para o GitHub!")
+    
+    if STORAGE_MODE == "particionado":
+        st.divider()
+        st.subheader("Armazenamento Particionado")
+        st.caption("Migra os CSVs antigos para partições mensais e remove linhas duplicadas.")
+        if st.button("🗜️ Compactar Partições"):
+            for file_key in PARTITIONED_DIRS:
+                if compact_partitions(file_key):
+                    st.success(f"Partições de {file_key} compactadas!")
+    
+    st.divider()
+    st.subheader("🩺 Diagnóstico")
+    st.caption(f"Últimos {METRICS_BUFFER_SIZE} eventos deste processo: chamadas ao GitHub, leitura e "
+               "gravação das tabelas, índice, gráficos e o tempo total de cada execução da página.")
+    metrics = get_metrics()
+    limite = metrics.rate_limit
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if limite:
+            st.metric("Requisições restantes (GitHub)", f"{limite['restantes']} / {limite['limite']}")
+    with col2:
+        if limite:
+            st.metric("Limite renova às", datetime.fromtimestamp(limite["reinicio"]).strftime("%H:%M"))
+    with col3:
+        eventos = metrics.recent()
+        if not eventos.empty and (eventos["operacao"] == "rerun").any():
+            ultima = eventos.loc[eventos["operacao"] == "rerun", "segundos"].iloc[-1]
+            st.metric("Última execução da página", f"{ultima * 1000:.0f} ms")
+    
+    resumo_metricas = metrics.summary()
+    if not resumo_metricas.empty:
+        st.dataframe(resumo_metricas, hide_index=True, use_container_width=True,
+                     column_config={col: st.column_config.NumberColumn(col, format="%.1f")
+                                    for col in ["p50 (ms)", "p95 (ms)", "Máx (ms)", "Total (s)"]})
+        with st.expander("Eventos recentes"):
+            eventos = metrics.recent(100).iloc[::-1]
+            eventos["ts"] = pd.to_datetime(eventos["ts"], unit="s")
+            st.dataframe(eventos, hide_index=True, use_container_width=True)
+        if st.button("🧹 Limpar Diagnóstico"):
+            metrics.reset()
+            st.rerun()
+    else:
+        st.info("Nenhum evento registrado ainda.")
+    if METRICS_PORT:
+        st.caption(f"Métricas no formato Prometheus em http://<host>:{METRICS_PORT}/metrics")
+
+# ⏳ Indicador de gravações pendentes (no fim, para já contar o que esta execução enfileirou)
+if WRITE_BEHIND:
+    writer = get_writer()
+    pendentes = writer.pending_count()
+    if writer.last_error and pendentes:
+        st.sidebar.warning(f"📴 {writer.last_error}. {pendentes} gravação(ões) pendente(s) serão reenviadas.")
+    elif pendentes:
+        st.sidebar.info(f"⏳ {pendentes} gravação(ões) pendente(s)")
+    else:
+        st.sidebar.caption("✅ Tudo sincronizado")
+
+# 📴 Aviso de leitura sem conexão (os dados vêm do cache deste aparelho)
+offline = get_metrics().offline
+if offline:
+    desde = datetime.fromtimestamp(offline["desde"]).strftime("%H:%M")
+    st.sidebar.warning(f"📴 Sem conexão com o GitHub desde {desde}: mostrando os dados salvos neste aparelho.")
+
+# 🚦 Aviso antes de esgotar o limite de requisições do GitHub
+limite = get_metrics().rate_limit
+if limite and limite["restantes"] < RATE_LIMIT_WARN:
+    renova = datetime.fromtimestamp(limite["reinicio"]).strftime("%H:%M")
+    st.sidebar.warning(f"🚦 Restam {limite['restantes']} de {limite['limite']} requisições ao GitHub "
+                       f"(renova às {renova}). Leituras podem falhar até lá.")
+
+get_metrics().record("rerun", time.perf_counter() - _rerun_inicio, alvo=aba)